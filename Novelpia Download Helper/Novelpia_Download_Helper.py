@@ -4,37 +4,1772 @@ import json
 import re
 import logging
 import html
+import html.entities
 import time
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
-import tkinter as tk
-from tkinter import messagebox, filedialog
-from tkinter import ttk
 from io import BytesIO
-from PIL import Image, ImageTk
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
 import threading
 import queue
+import heapq
+import hashlib
+import unicodedata
+import shutil
+import zipfile
+import zlib
+import mimetypes
+import random
+from email.utils import parsedate_to_datetime
+import argparse
+import sqlite3
+import multiprocessing
+import socket
+import cProfile
+import pstats
+import io
+import sys
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# tkinter and Pillow are only needed by the GUI and are imported by load_gui_modules()
+# when it is launched, so headless batch runs never pay for them.
+tk = messagebox = filedialog = ttk = tkfont = Image = ImageTk = None
+
+# Per-user state that doesn't belong to any one download folder (the GUI's full log, cover thumbnails,
+# the library search index)
+APP_DIR = os.path.join(os.path.expanduser('~'), '.novelpia_download_helper')
+
+def load_gui_modules():
+    global tk, messagebox, filedialog, ttk, tkfont, Image, ImageTk
+    import tkinter as tk
+    from tkinter import messagebox, filedialog
+    from tkinter import ttk
+    import tkinter.font as tkfont
+    from PIL import Image, ImageTk
+
+def parse_cookies(cookies_json):
+    cookies = json.loads(cookies_json)
+    return {cookie['name']: cookie['value'] for cookie in cookies}
+
+class RateLimiter:
+    # Token bucket shared by every worker: at most `requests_per_second` requests
+    # are started per second (with bursts of up to `burst`), and at most
+    # `max_in_flight` requests are outstanding at any time.
+    def __init__(self, requests_per_second=None, max_in_flight=None, burst=1):
+        self.requests_per_second = requests_per_second
+        self.max_in_flight = max_in_flight
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self.condition.wait()
+            self.in_flight += 1
+
+            wait = 0
+            if self.requests_per_second:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.requests_per_second)
+                self.last_refill = now
+                # Reserve a token even if the bucket is empty so waiting callers are served in order
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = -self.tokens / self.requests_per_second
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def set_limits(self, requests_per_second, max_in_flight):
+        with self.condition:
+            now = time.monotonic()
+            if self.requests_per_second:
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.requests_per_second)
+            self.last_refill = now
+            self.requests_per_second = requests_per_second
+            self.max_in_flight = max_in_flight
+            self.condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+class AdaptiveController:
+    # Wraps every request with retries and tunes the shared RateLimiter (AIMD).
+    # 429, 5xx and connection failures are retried with jittered exponential
+    # backoff (or after Retry-After, which pauses every worker). Decisions are made
+    # per window of `window` requests: once the failures in a window reach
+    # `error_threshold` of it, the request rate and concurrency are halved; a window
+    # with few failures adds a step back, and a latency well above the best seen so
+    # far backs off gently. Scattered failures never reset the window, so a server
+    # that fails now and then doesn't hold the rate at the floor.
+    #
+    # The configured rate is the starting point: the controller may go up to max_rate
+    # (4x the configured rate by default) and never below the smaller of min_rate and
+    # the configured rate. Without a configured rate or max_rate there is no ceiling;
+    # a limit is only imposed when the server pushes back, and lifted once it recovers.
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, rate_limiter, logger, max_rate=None, max_concurrency=None, adaptive=True, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, min_rate=0.2, rate_step=0.5, window=20, error_threshold=0.25,
+                 latency_factor=3.0, sleep=time.sleep):
+        self.rate_limiter = rate_limiter
+        self.logger = logger
+        self.adaptive = adaptive
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_rate = min_rate
+        self.rate_step = rate_step
+        self.window = window
+        self.error_threshold = error_threshold
+        self.latency_factor = latency_factor
+        self.sleep = sleep
+
+        configured_rate = rate_limiter.requests_per_second
+        self.max_concurrency = max_concurrency or rate_limiter.max_in_flight or 1
+        self.concurrency = rate_limiter.max_in_flight or self.max_concurrency
+        self.max_rate = max_rate or (configured_rate * 4 if configured_rate else None)
+        self.min_rate = min(min_rate, configured_rate) if configured_rate else min_rate
+        # None while no rate limit is in force
+        self.rate = configured_rate or self.max_rate
+        # The throughput at which an uncapped run first had to be limited; the limit is lifted above it
+        self.release_rate = None
+        self.latency_ewma = None
+        self.best_latency = None
+        self.window_requests = 0
+        self.window_failures = 0
+        self.errors = 0
+        self.retries = 0
+        self.last_decrease = 0
+        self.paused_until = 0
+        self.lock = threading.Lock()
+        if adaptive:
+            self.rate_limiter.set_limits(self.rate, self.concurrency)
+
+    @classmethod
+    def for_interval(cls, interval, max_in_flight, logger, **kwargs):
+        # A controller over a new RateLimiter for an average of `interval` seconds between requests (0 for no limit)
+        requests_per_second = 1 / interval if interval and interval > 0 else None
+        return cls(RateLimiter(requests_per_second, max_in_flight), logger, **kwargs)
+
+    def request(self, send, method, url, **kwargs):
+        attempt = 0
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                self.sleep(pause)
+
+            try:
+                with self.rate_limiter:
+                    start = time.monotonic()
+                    response = send(method, url, **kwargs)
+                    latency = time.monotonic() - start
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.on_failure(f"{type(e).__name__} for {url}")
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    self.on_success(latency)
+                    return response
+
+                self.on_failure(f"HTTP {response.status_code} for {url}")
+                if attempt >= self.max_retries:
+                    return response
+                retry_after = self.retry_after_delay(response)
+                if retry_after is not None:
+                    delay = min(retry_after, self.max_delay)
+                    with self.lock:
+                        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                else:
+                    delay = self.backoff_delay(attempt)
+
+            attempt += 1
+            with self.lock:
+                self.retries += 1
+            logging.warning(f"Retrying {method} {url} in {delay:.1f}s (attempt {attempt} of {self.max_retries})")
+            self.sleep(delay)
+
+    def backoff_delay(self, attempt):
+        # Equal jitter: half the exponential step is fixed, the other half random
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    @staticmethod
+    def retry_after_delay(response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def on_success(self, latency):
+        with self.lock:
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            self.best_latency = self.latency_ewma if self.best_latency is None else min(self.best_latency, self.latency_ewma)
+            if self.adaptive:
+                self.window_requests += 1
+                self.check_window()
+
+    def on_failure(self, reason):
+        with self.lock:
+            self.errors += 1
+            if self.adaptive:
+                self.window_requests += 1
+                self.window_failures += 1
+                self.check_window(reason)
+
+    def check_window(self, reason=None):
+        # Caller holds the lock. Back off as soon as the window has seen too many
+        # failures; otherwise decide once it is full.
+        failure_limit = self.error_threshold * self.window
+        if self.window_failures >= failure_limit:
+            failures, requests_seen = self.window_failures, self.window_requests
+            self.window_requests = self.window_failures = 0
+            self.decrease(0.5, f"{failures} of {requests_seen} requests failed, last: {reason}")
+            return
+        if self.window_requests < self.window:
+            return
+        failures = self.window_failures
+        self.window_requests = self.window_failures = 0
+
+        # Let the baseline forget slowly, so a server that has become slower for good
+        # doesn't keep the rate down forever
+        if self.best_latency is not None:
+            self.best_latency *= 1.1
+        if self.latency_ewma is not None and self.latency_ewma > self.best_latency * self.latency_factor:
+            self.decrease(0.8, f"latency {self.latency_ewma * 1000:.0f} ms")
+        elif failures <= failure_limit / 2:
+            self.increase()
+
+    def increase(self):
+        # Caller holds the lock. Additive steps near the floor, 10% steps at higher rates
+        # so a long slowdown doesn't take hundreds of windows to undo.
+        if self.rate is None:
+            return
+        rate = self.rate + max(self.rate_step, self.rate * 0.1)
+        if self.max_rate is not None:
+            rate = min(self.max_rate, rate)
+        elif self.release_rate is not None and rate >= self.release_rate:
+            rate = None
+        concurrency = min(self.max_concurrency, self.concurrency + 1)
+        if rate == self.rate and concurrency == self.concurrency:
+            return
+        self.rate, self.concurrency = rate, concurrency
+        self.apply("healthy responses")
+
+    def decrease(self, factor, reason):
+        # Caller holds the lock. A burst of failures from requests that were already
+        # in flight counts as one congestion signal.
+        now = time.monotonic()
+        if now - self.last_decrease < 1.0:
+            return
+        self.last_decrease = now
+        if self.rate is None:
+            # Uncapped so far: start limiting from the throughput the workers were getting
+            self.release_rate = self.concurrency / self.latency_ewma if self.latency_ewma else float(self.concurrency)
+            self.rate = self.release_rate
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.concurrency = max(1, int(self.concurrency * factor))
+        self.apply(reason)
+
+    def apply(self, reason):
+        self.rate_limiter.set_limits(self.rate, self.concurrency)
+        self.logger(f"Adaptive throttle ({reason}): {self.state()}")
+
+    def state(self):
+        latency = f"{self.latency_ewma * 1000:.0f} ms" if self.latency_ewma is not None else "n/a"
+        rate = f"{self.rate:.2f} req/s" if self.rate is not None else "no rate limit"
+        return (f"{rate}, {self.concurrency} in flight, latency {latency}, "
+                f"{self.errors} errors, {self.retries} retries")
+
+class ChapterBodyParser(HTMLParser):
+    # Turns the `s` items of a viewer_data payload into text lines and cover image
+    # sources. It produces the same output as running BeautifulSoup(para,
+    # 'html.parser').get_text() on every paragraph, but reuses one tokenizer for the
+    # whole chapter and skips it entirely for paragraphs without markup.
+
+    # Strings inside these tags are not part of BeautifulSoup's get_text() output
+    HIDDEN_TEXT_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+    # Inside these tags whitespace-only strings are kept as they are
+    PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+    # The characters BeautifulSoup treats as whitespace when it collapses a string
+    ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.text_parts = []
+        self.image_sources = []
+        self.pending = []
+        self.open_tags = []
+        self.hidden_depth = 0
+        self.preserve_depth = 0
+
+    def parse(self, items):
+        segments = []
+        for item in items:
+            text = html.unescape(item.get('text', ''))
+            text = text.replace('&nbsp;&nbsp;', '\n\n')
+            text = text.replace('&nbsp;', '\n')
+
+            for para in text.split('\n'):
+                if '<' not in para and '&' not in para:
+                    processed_text = para.strip()
+                else:
+                    processed_text = self.parse_paragraph(para)
+                    for src in self.image_sources:
+                        segments.append(('image', src))
+                if processed_text:
+                    segments.append(('text', processed_text))
+        return segments
+
+    def parse_paragraph(self, para):
+        self.reset()
+        self.text_parts = []
+        self.image_sources = []
+        self.pending = []
+        self.open_tags = []
+        self.hidden_depth = 0
+        self.preserve_depth = 0
+        self.feed(para)
+        self.close()
+        self.end_string()
+        return ''.join(self.text_parts).strip()
+
+    def end_string(self, cdata=False):
+        # BeautifulSoup joins the data between two tags into one string and replaces a
+        # string made only of whitespace with a single space (or newline) outside <pre>.
+        # CDATA sections stay CData strings even inside hidden tags, so they are always text.
+        if not self.pending:
+            return
+        data = ''.join(self.pending)
+        self.pending = []
+        if self.hidden_depth and not cdata:
+            return
+        if not self.preserve_depth and not data.strip(self.ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        self.text_parts.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self.end_string()
+        self.open_tags.append(tag)
+        if tag in self.HIDDEN_TEXT_TAGS:
+            self.hidden_depth += 1
+        elif tag in self.PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth += 1
+        elif tag == 'img':
+            attributes = dict(attrs)
+            if 'cover-img' in (attributes.get('class') or '').split() and attributes.get('src') is not None:
+                self.image_sources.append(attributes['src'])
+
+    def handle_endtag(self, tag):
+        # Like BeautifulSoup, close the most recent open tag of this name and everything
+        # opened inside it; an end tag that matches nothing open is ignored
+        self.end_string()
+        if tag not in self.open_tags:
+            return
+        while True:
+            closed = self.open_tags.pop()
+            if closed in self.HIDDEN_TEXT_TAGS:
+                self.hidden_depth -= 1
+            elif closed in self.PRESERVE_WHITESPACE_TAGS:
+                self.preserve_depth -= 1
+            if closed == tag:
+                return
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    def handle_entityref(self, name):
+        # Unknown names are kept as literal text, without the semicolon, like BeautifulSoup does
+        self.handle_data(html.entities.html5.get(name + ';', '&' + name))
+
+    def handle_charref(self, name):
+        self.handle_data(html.unescape(f"&#{name};"))
+
+    def handle_comment(self, data):
+        self.end_string()
+
+    def handle_decl(self, decl):
+        self.end_string()
+
+    def handle_pi(self, data):
+        self.end_string()
+
+    def unknown_decl(self, data):
+        self.end_string()
+        if data.upper().startswith('CDATA['):
+            self.handle_data(data[len('CDATA['):])
+            self.end_string(cdata=True)
+
+def parse_chapter_body(items):
+    return ChapterBodyParser().parse(items)
+
+# Stands in for an image line until the image has been downloaded; it is a single
+# non-empty line, so normalizing around it gives the same text as the final line would
+IMAGE_PLACEHOLDER = '\x00{}\x00'
+
+def render_chapter(chapter, items):
+    # The CPU-bound part of a chapter: HTML cleanup and normalization of its viewer_data
+    # items. A plain module-level function of picklable arguments so it can run in a
+    # worker process. Returns the text with image placeholders, the image sources in
+    # placeholder order and the seconds spent.
+    start = time.perf_counter()
+    chapter_content = []
+    image_sources = []
+    for kind, value in parse_chapter_body(items):
+        if kind == 'image':
+            chapter_content.append(IMAGE_PLACEHOLDER.format(len(image_sources)) + '\n')
+            image_sources.append(value)
+        else:
+            chapter_content.append(value + '\n')
+
+    chapter_text = '\n'.join(chapter_content)
+    chapter_text = re.sub(r'\n{3,}', '\n\n', chapter_text)
+    chapter_text = f"Chapter {chapter['number']}: {chapter['title']}\n\n" + chapter_text
+
+    if not chapter_text.strip():
+        raise ValueError("Chapter content is empty")
+    return chapter_text, image_sources, time.perf_counter() - start
+
+def sanitize_filename(filename):
+    return re.sub(r'[\\/*?:"<>|]', '', filename)
+
+class ChapterRecord:
+    # One chapter, without a per-instance dict. Supports chapter['id'] style access so
+    # it can go anywhere a chapter dict used to, and carries its chapter filename so it
+    # is sanitized once instead of on every save, resume check and compile.
+    __slots__ = ('id', 'title', 'number', 'filename')
+
+    def __init__(self, id, title, number):
+        self.id = id
+        self.title = title
+        self.number = number
+        self.filename = f"{number:04d}_{sanitize_filename(title)}.txt"
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {'id': self.id, 'title': self.title, 'number': self.number}
+
+    def __repr__(self):
+        return f"ChapterRecord(id={self.id!r}, title={self.title!r}, number={self.number!r})"
+
+class ChapterIndex:
+    # Ordered chapter list of a novel with O(1) lookup by chapter id and by number, plus
+    # the selections the GUI and CLI need (number ranges, title patterns, chapters new
+    # since a previous list). Behaves like a list of ChapterRecords otherwise.
+
+    # One part of a selection: a /regex/ (which may contain commas; write '/' as '\/')
+    # or anything up to the next comma
+    SELECTION_PART = re.compile(r'\s*(/(?:\\.|[^\\/])*/|[^,]*?)\s*(?:,|$)')
+
+    def __init__(self, chapters=()):
+        self.records = []
+        self.positions_by_id = {}
+        self.positions_by_number = {}
+        # True while numbers strictly increase along the list, which lets ranges be sliced
+        self.numbered_in_order = True
+        self.extend(chapters)
+
+    @staticmethod
+    def record(chapter):
+        if isinstance(chapter, ChapterRecord):
+            return chapter
+        return ChapterRecord(chapter['id'], chapter['title'], chapter['number'])
+
+    def append(self, chapter):
+        record = self.record(chapter)
+        if self.records and record.number <= self.records[-1].number:
+            self.numbered_in_order = False
+        self.positions_by_id[record.id] = len(self.records)
+        self.positions_by_number.setdefault(record.number, len(self.records))
+        self.records.append(record)
+        return record
+
+    def extend(self, chapters):
+        for chapter in chapters:
+            self.append(chapter)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, position):
+        return self.records[position]
+
+    def __contains__(self, chapter_id):
+        return chapter_id in self.positions_by_id
+
+    def __add__(self, chapters):
+        return ChapterIndex(list(self.records) + list(chapters))
+
+    def by_number(self, number):
+        position = self.positions_by_number.get(number)
+        return self.records[position] if position is not None else None
+
+    def position(self, chapter_id):
+        return self.positions_by_id.get(chapter_id)
+
+    def last_number(self):
+        return max(self.positions_by_number, default=0)
+
+    def select_range(self, first=None, last=None):
+        if self.numbered_in_order:
+            start = self.range_position(first, 0)
+            end = self.range_position(last, len(self.records), after=True)
+            if start is not None and end is not None:
+                return self.records[start:end]
+        return [record for record in self.records
+                if (first is None or record.number >= first) and (last is None or record.number <= last)]
+
+    def range_position(self, number, default, after=False):
+        # Slice bound for a range end, or None if the number falls in a gap of the numbering
+        if number is None or not self.records:
+            return default
+        if number < self.records[0].number:
+            return 0
+        if number > self.records[-1].number:
+            return len(self.records)
+        position = self.positions_by_number.get(number)
+        if position is None:
+            return None
+        return position + 1 if after else position
+
+    def select_pattern(self, pattern):
+        title_pattern = re.compile(pattern, re.IGNORECASE)
+        return [record for record in self.records if title_pattern.search(record.title)]
+
+    def new_since(self, known):
+        # Chapters not in `known`: a previous ChapterIndex, any collection of chapter ids,
+        # or the last chapter number seen before
+        if isinstance(known, int):
+            return [record for record in self.records if record.number > known]
+        return [record for record in self.records if record.id not in known]
+
+    def select(self, spec, known=None):
+        # Comma-separated parts, combined in chapter order: "12", "100-500", "900-" (to the
+        # end), "-50", "/regex/" matched against titles, or "new" for the chapters not in
+        # `known` (see new_since)
+        selected = set()
+        position = 0
+        while position < len(spec):
+            match = self.SELECTION_PART.match(spec, position)
+            position = match.end()
+            part = match.group(1)
+            if not part:
+                continue
+            if len(part) > 1 and part.startswith('/') and part.endswith('/'):
+                records = self.select_pattern(part[1:-1])
+            elif part.lower() == 'new':
+                if known is None:
+                    raise ValueError("'new' needs to know which chapters are already downloaded")
+                records = self.new_since(known)
+            elif '-' in part:
+                first, last = (value.strip() for value in part.split('-', 1))
+                records = self.select_range(int(first) if first else None, int(last) if last else None)
+            else:
+                record = self.by_number(int(part))
+                records = [record] if record else []
+            selected.update(record.id for record in records)
+        return [record for record in self.records if record.id in selected]
+
+    def to_dicts(self):
+        return [record.as_dict() for record in self.records]
+
+class DownloadManifest:
+    # Append-only JSON Lines journal with one record per saved chapter; the most
+    # recent record for a chapter id wins. Appending keeps each update O(1) and
+    # a torn last line after a crash only loses that one record.
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        line_count = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line_count += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Skipping corrupt manifest line {line_count} in {self.path}")
+                    continue
+                self.entries[entry['id']] = entry
+        if line_count > 2 * len(self.entries) + 100:
+            self.compact()
+
+    def compact(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(temp_path, self.path)
+
+    def record(self, chapter, status, content_hash, size, filename):
+        entry = {
+            'id': chapter['id'],
+            'number': chapter['number'],
+            'title': chapter['title'],
+            'status': status,
+            'sha256': content_hash,
+            'size': size,
+            'filename': filename,
+            'timestamp': time.time()
+        }
+        with self.lock:
+            self.entries[chapter['id']] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def is_complete(self, chapter, filepath):
+        entry = self.entries.get(chapter['id'])
+        if not entry or entry['status'] != 'ok' or entry['filename'] != os.path.basename(filepath):
+            return False
+        try:
+            return os.path.getsize(filepath) == entry['size']
+        except OSError:
+            return False
+
+class ChapterStore:
+    # Packed alternative to one .txt file per chapter: every chapter of a novel is a row
+    # in a single SQLite database, optionally zlib-compressed. Each save is its own
+    # transaction, so a chapter is either fully stored or not at all, and the store
+    # doubles as the resume record (status and hash per chapter id). Reads go through
+    # SQLite's memory-mapped I/O.
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, path, compress=False):
+        self.path = path
+        self.compress = compress
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS chapters ('
+            'id TEXT PRIMARY KEY, number INTEGER, title TEXT, status TEXT, compression TEXT, '
+            'size INTEGER, sha256 TEXT, updated_ns INTEGER, body BLOB)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS chapters_number ON chapters (number)')
+        self.db.commit()
+
+    def put(self, chapter, content, status='ok'):
+        data = content.encode('utf-8')
+        body, compression = data, None
+        if self.compress:
+            compressed = zlib.compress(data, 6)
+            if len(compressed) < len(data):
+                body, compression = compressed, 'zlib'
+
+        with self.lock, self.db:
+            # An error placeholder never replaces a chapter that was stored successfully before
+            self.db.execute(
+                'INSERT INTO chapters (id, number, title, status, compression, size, sha256, updated_ns, body) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET number = excluded.number, title = excluded.title, '
+                'status = excluded.status, compression = excluded.compression, size = excluded.size, '
+                'sha256 = excluded.sha256, updated_ns = excluded.updated_ns, body = excluded.body '
+                "WHERE excluded.status = 'ok' OR chapters.status != 'ok'",
+                (chapter['id'], chapter['number'], chapter['title'], status, compression, len(data),
+                 hashlib.sha256(data).hexdigest(), time.time_ns(), body)
+            )
+
+    @staticmethod
+    def decode(body, compression):
+        return zlib.decompress(body) if compression == 'zlib' else body
+
+    def get_bytes(self, chapter_id):
+        with self.lock:
+            row = self.db.execute('SELECT body, compression FROM chapters WHERE id = ?', (chapter_id,)).fetchone()
+        return self.decode(*row) if row else None
+
+    def get(self, chapter_id):
+        data = self.get_bytes(chapter_id)
+        return data.decode('utf-8') if data is not None else None
+
+    def entries(self):
+        # Metadata for every stored chapter, without the bodies
+        with self.lock:
+            rows = self.db.execute('SELECT id, number, title, status, size, updated_ns FROM chapters').fetchall()
+        return {row[0]: {'id': row[0], 'number': row[1], 'title': row[2], 'status': row[3],
+                         'size': row[4], 'updated_ns': row[5]} for row in rows}
+
+    def is_complete(self, chapter):
+        with self.lock:
+            row = self.db.execute('SELECT status FROM chapters WHERE id = ?', (chapter['id'],)).fetchone()
+        return row is not None and row[0] == 'ok'
+
+    def iter_chapters(self):
+        # One sequential pass in chapter order on a separate read connection (WAL lets it run
+        # alongside writers), so only one chapter body is in memory at a time
+        reader = sqlite3.connect(self.path)
+        try:
+            reader.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+            rows = reader.execute('SELECT id, number, title, status, body, compression FROM chapters ORDER BY number, id')
+            for chapter_id, number, title, status, body, compression in rows:
+                yield {'id': chapter_id, 'number': number, 'title': title}, status, self.decode(body, compression)
+        finally:
+            reader.close()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def search_tokens(text):
+    # Korean has no reliable word boundaries for a simple tokenizer, so every run of letters
+    # and digits is indexed as overlapping character bigrams, plus its last character on its
+    # own so single-character queries can match at any position with a prefix query
+    tokens = []
+    for run in re.findall(r'[^\W_]+', unicodedata.normalize('NFKC', text).lower()):
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        tokens.append(run[-1])
+    return tokens
+
+class SearchIndex:
+    # Full-text index over downloaded chapters, shared by every novel in the library.
+    # Chapter texts are tokenized into bigrams and kept in a contentless FTS5 table (only
+    # the compressed posting lists are stored, ranked with BM25). The text itself stays in
+    # the library: each chapter row records where it was saved (its chapters/*.txt file, or
+    # the packed ChapterStore and the chapter's id in it) and snippets are read from there.
+    # Chapters are keyed by novel ID and chapter number and re-indexed only when their
+    # content hash changes.
+    SNIPPET_CHARS = 40
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS chapters ('
+                'doc INTEGER PRIMARY KEY, novel_id TEXT, number INTEGER, title TEXT, sha256 TEXT, '
+                'source TEXT, store_id TEXT, UNIQUE (novel_id, number))'
+            )
+            columns = {row[1] for row in self.db.execute('PRAGMA table_info(chapters)')}
+            # Indexes written before snippets came from the library hold a compressed copy of each
+            # chapter; it is kept for snippets until the chapter is indexed again with its source
+            self.legacy_bodies = 'body' in columns
+            if 'source' not in columns:
+                self.db.execute('ALTER TABLE chapters ADD COLUMN source TEXT')
+                self.db.execute('ALTER TABLE chapters ADD COLUMN store_id TEXT')
+            self.db.execute('CREATE TABLE IF NOT EXISTS novels (novel_id TEXT PRIMARY KEY, title TEXT)')
+            # Fails with "no such module: fts5" on SQLite builds without FTS5
+            self.db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS postings USING fts5(tokens, content='', "
+                "tokenize='unicode61 remove_diacritics 0')"
+            )
+            self.db.commit()
+        except sqlite3.Error:
+            self.db.close()
+            raise
+
+    def add(self, novel_id, chapter, content, novel_title=None, source=None, store_id=None):
+        # source is where the library saved this chapter: a text file, or with store_id a packed
+        # ChapterStore. Hashing and tokenizing run outside the lock, so downloader threads only
+        # queue up for the SQLite writes
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        source = os.path.abspath(source) if source else None
+        with self.lock:
+            row = self.db.execute('SELECT sha256 FROM chapters WHERE novel_id = ? AND number = ?',
+                                  (novel_id, chapter['number'])).fetchone()
+        tokens = None if row and row[0] == content_hash else ' '.join(search_tokens(content))
+        location = 'title = ?, source = ?, store_id = ?' + (', body = NULL' if self.legacy_bodies else '')
+
+        with self.lock, self.db:
+            if novel_title:
+                self.db.execute('INSERT OR REPLACE INTO novels (novel_id, title) VALUES (?, ?)', (novel_id, novel_title))
+            current = self.db.execute('SELECT doc, sha256 FROM chapters WHERE novel_id = ? AND number = ?',
+                                      (novel_id, chapter['number'])).fetchone()
+            if current and current[1] == content_hash:
+                # Same text, but it may have been saved somewhere else this time (another folder, files <-> packed)
+                if source:
+                    self.db.execute(f'UPDATE chapters SET {location} WHERE doc = ?',
+                                    (chapter['title'], source, store_id, current[0]))
+                return False
+            if tokens is None:
+                # The chapter changed under us since the first look; rare, so just do the work here
+                tokens = ' '.join(search_tokens(content))
+            if current:
+                # A contentless FTS5 table forgets a document only when told its original tokens, and the
+                # library has already overwritten the old text. So the chapter moves to a new doc number;
+                # the old postings stay behind unreferenced (search joins through chapters, so they never
+                # match) and the number is never handed out again, since rows are never deleted
+                doc = self.db.execute('SELECT MAX(doc) + 1 FROM chapters').fetchone()[0]
+                self.db.execute(f'UPDATE chapters SET doc = ?, sha256 = ?, {location} WHERE doc = ?',
+                                (doc, content_hash, chapter['title'], source, store_id, current[0]))
+            else:
+                doc = self.db.execute(
+                    'INSERT INTO chapters (novel_id, number, title, sha256, source, store_id) VALUES (?, ?, ?, ?, ?, ?)',
+                    (novel_id, chapter['number'], chapter['title'], content_hash, source, store_id)
+                ).lastrowid
+            self.db.execute('INSERT INTO postings (rowid, tokens) VALUES (?, ?)', (doc, tokens))
+        return True
+
+    @staticmethod
+    def read_source(source, store_id, stores):
+        # The chapter text as the library has it now, or None if it was moved or deleted.
+        # stores caches one read connection per packed store for the duration of a search
+        try:
+            if store_id is None:
+                with open(source, 'r', encoding='utf-8') as f:
+                    return f.read()
+            if source not in stores:
+                # Connecting to a missing path would create an empty database there
+                stores[source] = sqlite3.connect(source) if os.path.exists(source) else None
+            if stores[source] is None:
+                return None
+            row = stores[source].execute('SELECT body, compression FROM chapters WHERE id = ?', (store_id,)).fetchone()
+            return ChapterStore.decode(*row).decode('utf-8') if row else None
+        except (OSError, sqlite3.Error, zlib.error, UnicodeDecodeError):
+            return None
+
+    @staticmethod
+    def build_query(query):
+        # Every query term must appear; a term matches as a phrase of consecutive bigrams
+        terms = []
+        for run in re.findall(r'[^\W_]+', unicodedata.normalize('NFKC', query).lower()):
+            if len(run) == 1:
+                terms.append(f'"{run}" *')
+            else:
+                terms.append('"' + ' '.join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+        return ' '.join(terms)
+
+    def search(self, query, novel_id=None, limit=20):
+        match = self.build_query(query)
+        if not match:
+            return []
+        sql = ('SELECT c.novel_id, n.title, c.number, c.title, postings.rank, c.source, c.store_id, '
+               + ('c.body' if self.legacy_bodies else 'NULL') + ' FROM postings '
+               'JOIN chapters c ON c.doc = postings.rowid LEFT JOIN novels n ON n.novel_id = c.novel_id '
+               'WHERE postings MATCH ?')
+        params = [match]
+        if novel_id is not None:
+            sql += ' AND c.novel_id = ?'
+            params.append(novel_id)
+        sql += ' ORDER BY postings.rank LIMIT ?'
+        params.append(limit)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+
+        terms = sorted(re.findall(r'[^\W_]+', unicodedata.normalize('NFKC', query).lower()), key=len, reverse=True)
+        hits = []
+        stores = {}
+        try:
+            for hit_novel_id, novel_title, number, title, rank, source, store_id, body in rows:
+                if body is not None:
+                    text = zlib.decompress(body).decode('utf-8')
+                else:
+                    text = self.read_source(source, store_id, stores) if source else None
+                snippet, highlight = self.snippet(text, terms) if text is not None else ('', None)
+                hits.append({'novel_id': hit_novel_id, 'novel_title': novel_title, 'number': number, 'title': title,
+                             'score': -rank, 'snippet': snippet, 'highlight': highlight})
+        finally:
+            for store in stores.values():
+                if store is not None:
+                    store.close()
+        return hits
+
+    def snippet(self, text, terms):
+        # A window of text around the first occurrence of the longest query term, and the
+        # (start, end) of that term within the window
+        normalized = unicodedata.normalize('NFKC', text).lower()
+        for term in terms:
+            position = normalized.find(term)
+            if position >= 0:
+                break
+        else:
+            return text[:2 * self.SNIPPET_CHARS].replace('\n', ' '), None
+        start = max(0, position - self.SNIPPET_CHARS)
+        end = position + len(term) + self.SNIPPET_CHARS
+        prefix = '…' if start else ''
+        # Normalization rarely changes the length; when it does, show the normalized text so offsets still line up
+        source = text if len(normalized) == len(text) else normalized
+        snippet = prefix + source[start:end].replace('\n', ' ')
+        if end < len(normalized):
+            snippet += '…'
+        return snippet, (len(prefix) + position - start, len(prefix) + position - start + len(term))
+
+    def stats(self):
+        with self.lock:
+            chapters, novels = self.db.execute('SELECT COUNT(*), COUNT(DISTINCT novel_id) FROM chapters').fetchone()
+        return f"Search index: {chapters} chapters from {novels} novels in {self.path}"
+
+class EpubWriter:
+    # Writes an EPUB 3 book incrementally. Chapter pages and images are streamed
+    # into the zip container as soon as they are added; only the small package
+    # document and navigation files are generated when the book is closed.
+    CONTAINER_XML = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+        '  <rootfiles>\n'
+        '    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>\n'
+        '  </rootfiles>\n'
+        '</container>\n'
+    )
+    STYLESHEET = (
+        'body { font-family: serif; line-height: 1.6; }\n'
+        'h1, h2 { text-align: center; }\n'
+        'p { margin: 0 0 0.8em 0; }\n'
+        'div.illustration { text-align: center; margin: 1em 0; }\n'
+        'div.illustration img { max-width: 100%; }\n'
+    )
+    IMAGE_PLACEHOLDER_PATTERN = re.compile(r'^\[Cover Image: (.+)\]$')
+
+    def __init__(self, path, novel_id, images_dir):
+        self.path = path
+        self.temp_path = path + '.part'
+        self.novel_id = novel_id
+        self.images_dir = images_dir
+        self.title = "Unknown Title"
+        self.chapters = {}  # chapter number -> (href, title)
+        self.images = {}  # image filename -> (href, media type)
+        self.cover_href = None
+        self.has_title_page = False
+        self.lock = threading.Lock()
+
+        self.zip = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED)
+        # The mimetype entry has to come first and be stored uncompressed
+        self.zip.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        self.zip.writestr('META-INF/container.xml', self.CONTAINER_XML)
+        self.zip.writestr('OEBPS/style.css', self.STYLESHEET)
+
+    def set_novel_info(self, novel_info, cover_data=None, cover_media_type='image/jpeg'):
+        with self.lock:
+            self.title = novel_info.get('title') or self.title
+            if cover_data:
+                extension = mimetypes.guess_extension(cover_media_type) or '.jpg'
+                self.cover_href = f"images/cover{extension}"
+                self.images['__cover__'] = (self.cover_href, cover_media_type)
+                self.zip.writestr(f"OEBPS/{self.cover_href}", cover_data, compress_type=zipfile.ZIP_STORED)
+
+            body = f"<h1>{html.escape(self.title)}</h1>\n"
+            if self.cover_href:
+                body += f'<div class="illustration"><img src="../{self.cover_href}" alt="Cover"/></div>\n'
+            for paragraph in (novel_info.get('synopsis') or '').split('\n'):
+                if paragraph.strip():
+                    body += f"<p>{html.escape(paragraph.strip())}</p>\n"
+            self.zip.writestr('OEBPS/text/title.xhtml', self.xhtml_page(self.title, body))
+            self.has_title_page = True
+
+    def add_chapter(self, chapter, text):
+        lines = text.split('\n')
+        heading = lines[0] if lines else chapter['title']
+        body = [f"<h2>{html.escape(heading)}</h2>"]
+        image_filenames = []
+        for line in lines[1:]:
+            line = line.strip()
+            if not line:
+                continue
+            match = self.IMAGE_PLACEHOLDER_PATTERN.match(line)
+            if match and os.path.exists(os.path.join(self.images_dir, match.group(1))):
+                image_filenames.append(match.group(1))
+                body.append(f'<div class="illustration"><img src="../images/{html.escape(match.group(1))}" alt=""/></div>')
+            else:
+                body.append(f"<p>{html.escape(line)}</p>")
+        page = self.xhtml_page(heading, '\n'.join(body) + '\n').encode('utf-8')
+
+        href = f"text/chapter_{chapter['number']:04d}.xhtml"
+        with self.lock:
+            if chapter['number'] in self.chapters:
+                return
+            for filename in image_filenames:
+                if filename not in self.images:
+                    media_type = mimetypes.guess_type(filename)[0] or 'image/jpeg'
+                    self.images[filename] = (f"images/{filename}", media_type)
+                    self.zip.write(os.path.join(self.images_dir, filename), f"OEBPS/images/{filename}",
+                                   compress_type=zipfile.ZIP_STORED)
+            with self.zip.open(f"OEBPS/{href}", 'w') as f:
+                f.write(page)
+            self.chapters[chapter['number']] = (href, chapter['title'])
+
+    @staticmethod
+    def xhtml_page(title, body):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<!DOCTYPE html>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="ko" lang="ko">\n'
+            f'<head><title>{html.escape(title)}</title><link rel="stylesheet" type="text/css" href="../style.css"/></head>\n'
+            f'<body>\n{body}</body>\n'
+            '</html>\n'
+        )
+
+    def close(self):
+        with self.lock:
+            chapter_numbers = sorted(self.chapters)
+            identifier = f"urn:novelpia:{self.novel_id}"
+            modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+            manifest_items = [
+                '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+                '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>',
+                '<item id="style" href="style.css" media-type="text/css"/>'
+            ]
+            spine_items = []
+            if self.has_title_page:
+                manifest_items.append('<item id="title" href="text/title.xhtml" media-type="application/xhtml+xml"/>')
+                spine_items.append('<itemref idref="title"/>')
+            for index, (key, (href, media_type)) in enumerate(sorted(self.images.items())):
+                properties = ' properties="cover-image"' if key == '__cover__' else ''
+                manifest_items.append(f'<item id="image_{index}" href="{html.escape(href)}" media-type="{media_type}"{properties}/>')
+            for number in chapter_numbers:
+                href = self.chapters[number][0]
+                manifest_items.append(f'<item id="chapter_{number}" href="{href}" media-type="application/xhtml+xml"/>')
+                spine_items.append(f'<itemref idref="chapter_{number}"/>')
+
+            escaped_title = html.escape(self.title)
+            self.zip.writestr('OEBPS/content.opf', (
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+                '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+                f'    <dc:identifier id="book-id">{identifier}</dc:identifier>\n'
+                f'    <dc:title>{escaped_title}</dc:title>\n'
+                '    <dc:language>ko</dc:language>\n'
+                f'    <meta property="dcterms:modified">{modified}</meta>\n'
+                '  </metadata>\n'
+                '  <manifest>\n    ' + '\n    '.join(manifest_items) + '\n  </manifest>\n'
+                '  <spine toc="ncx">\n    ' + '\n    '.join(spine_items) + '\n  </spine>\n'
+                '</package>\n'
+            ))
+
+            nav_entries = '\n'.join(
+                f'<li><a href="{self.chapters[number][0]}">{html.escape(self.chapters[number][1])}</a></li>'
+                for number in chapter_numbers
+            )
+            self.zip.writestr('OEBPS/nav.xhtml', (
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<!DOCTYPE html>\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="ko" lang="ko">\n'
+                f'<head><title>{escaped_title}</title></head>\n'
+                f'<body>\n<nav epub:type="toc" id="toc"><h1>{escaped_title}</h1>\n<ol>\n{nav_entries}\n</ol></nav>\n</body>\n'
+                '</html>\n'
+            ))
+
+            nav_points = '\n'.join(
+                f'<navPoint id="nav_{number}" playOrder="{order}"><navLabel><text>{html.escape(self.chapters[number][1])}</text></navLabel>'
+                f'<content src="{self.chapters[number][0]}"/></navPoint>'
+                for order, number in enumerate(chapter_numbers, 1)
+            )
+            self.zip.writestr('OEBPS/toc.ncx', (
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+                f'<head><meta name="dtb:uid" content="{identifier}"/></head>\n'
+                f'<docTitle><text>{escaped_title}</text></docTitle>\n'
+                f'<navMap>\n{nav_points}\n</navMap>\n'
+                '</ncx>\n'
+            ))
+
+            self.zip.close()
+            os.replace(self.temp_path, self.path)
+
+class ResponseCache:
+    # Persistent cache for the novel page, episode_list and viewer_data responses.
+    # Bodies are BLOBs next to their metadata in one SQLite file, so a cached novel
+    # doesn't leave a loose file per response; the least recently used entries are
+    # evicted once max_bytes is exceeded.
+    # Stale entries are revalidated with ETag/Last-Modified when the server sent them.
+    ENDPOINT_TTLS = {
+        'novel_info': 60 * 60,
+        'episode_list': 10 * 60,
+        'viewer_data': 7 * 24 * 60 * 60
+    }
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, ttls=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttls = dict(self.ENDPOINT_TTLS, **(ttls or {}))
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.drop_body_files()
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, endpoint TEXT, url TEXT, size INTEGER, stored_at REAL, last_access REAL, '
+            'etag TEXT, last_modified TEXT, content_type TEXT, encoding TEXT, body BLOB)'
+        )
+        self.db.commit()
+        self.total_size = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def drop_body_files(self):
+        # Caches written before bodies moved into SQLite kept them as <xx>/<key> files
+        # indexed by an 'entries' table; they are only a cache, so just remove them
+        if not self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'entries'").fetchone():
+            return
+        self.db.execute('DROP TABLE entries')
+        self.db.commit()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if len(name) == 2 and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def endpoint_for(url):
+        endpoint = endpoint_name(url)
+        return endpoint if endpoint in ResponseCache.ENDPOINT_TTLS else None
+
+    @staticmethod
+    def make_key(method, url, data=None):
+        params = json.dumps(sorted((data or {}).items()), default=str)
+        return hashlib.sha256(f"{method} {url} {params}".encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT endpoint, stored_at, etag, last_modified, content_type, encoding FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        endpoint, stored_at, etag, last_modified, content_type, encoding = row
+        return {
+            'key': key,
+            'fresh': time.time() - stored_at < self.ttls.get(endpoint, 0),
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': content_type,
+            'encoding': encoding
+        }
+
+    def validators(self, entry):
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def build_response(self, entry, url):
+        with self.lock:
+            row = self.db.execute('SELECT body FROM responses WHERE key = ?', (entry['key'],)).fetchone()
+            if row is None:
+                # Evicted or invalidated since the lookup
+                return None
+            self.db.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), entry['key']))
+            self.db.commit()
+        body = row[0]
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response.headers = requests.structures.CaseInsensitiveDict()
+        if entry['content_type']:
+            response.headers['Content-Type'] = entry['content_type']
+        response.encoding = entry['encoding']
+        response.url = url
+        return response
+
+    @staticmethod
+    def cacheable(endpoint, response):
+        # A 200 can still be a login or maintenance page; only keep viewer_data that
+        # render_chapter could use, or a bad body would be served back for a week
+        if response.status_code != 200:
+            return False
+        if endpoint != 'viewer_data':
+            return True
+        try:
+            data = response.json()
+        except ValueError:
+            return False
+        return isinstance(data, dict) and isinstance(data.get('s'), list)
+
+    def record(self, outcome):
+        # outcome is 'hits', 'revalidated' or 'misses'; every download thread counts here
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def store(self, key, endpoint, url, response):
+        body = response.content
+        now = time.time()
+        with self.lock:
+            row = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if row:
+                self.total_size -= row[0]
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, endpoint, url, len(body), now, now, response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), response.headers.get('Content-Type'), response.encoding,
+                 sqlite3.Binary(body))
+            )
+            self.total_size += len(body)
+            self.evict()
+            self.db.commit()
+
+    def refresh(self, key):
+        now = time.time()
+        with self.lock:
+            self.db.execute('UPDATE responses SET stored_at = ?, last_access = ? WHERE key = ?', (now, now, key))
+            self.db.commit()
+
+    def evict(self):
+        # Caller holds the lock. Trim to 90% so eviction doesn't run on every store.
+        if self.total_size <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, size in self.db.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            if self.total_size <= target:
+                break
+            self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.total_size -= size
+
+    def invalidate(self, key):
+        with self.lock:
+            row = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if row:
+                self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.db.commit()
+                self.total_size -= row[0]
+
+    def stats(self):
+        with self.lock:
+            return (f"Response cache: {self.hits} hits, {self.revalidated} revalidated, {self.misses} misses, "
+                    f"{self.total_size / (1024 * 1024):.1f} MB stored")
+
+class ImagePipeline:
+    # Fetches chapter illustrations on a separate worker pool so chapters don't
+    # download their images one by one. Every URL is fetched at most once and
+    # stored under the hash of its content, so an illustration reused across
+    # chapters takes one request and one file. The URL -> file map is kept in
+    # images/index.json so later runs skip images they already have.
+    def __init__(self, downloader, images_dir, max_workers=4):
+        self.downloader = downloader
+        self.images_dir = images_dir
+        self.index_path = os.path.join(images_dir, 'index.json')
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.known_files = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.known_files = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def submit(self, img_url):
+        with self.lock:
+            future = self.futures.get(img_url)
+            if future is None:
+                future = self.executor.submit(self.fetch, img_url)
+                self.futures[img_url] = future
+            return future
+
+    def fetch(self, img_url):
+        known_filename = self.known_files.get(img_url)
+        if known_filename and os.path.exists(os.path.join(self.images_dir, known_filename)):
+            return known_filename
+
+        img_filename = self.downloader.download_image(img_url, self.images_dir)
+        if img_filename:
+            with self.lock:
+                self.known_files[img_url] = img_filename
+        return img_filename
+
+    def save_index(self):
+        with self.lock:
+            if not self.known_files:
+                return
+            os.makedirs(self.images_dir, exist_ok=True)
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.known_files, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+
+def endpoint_name(url):
+    if '/proc/viewer_data/' in url:
+        return 'viewer_data'
+    if '/proc/episode_list' in url:
+        return 'episode_list'
+    if '/novel/' in url:
+        return 'novel_info'
+    return 'image'
+
+# Connection setup timings for the request currently running on this thread,
+# filled in by the timed connection classes below (zero when a pooled
+# keep-alive connection is reused)
+connection_timings = threading.local()
+
+class TimedConnectionMixin:
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror:
+            # Let urllib3 raise its usual NameResolutionError
+            return super()._new_conn()
+        connection_timings.dns = time.perf_counter() - start
+
+        # Connect to the addresses we just resolved instead of resolving again
+        host = self._dns_host
+        last_error = None
+        try:
+            for address in dict.fromkeys(info[4][0] for info in addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    last_error = e
+            else:
+                raise last_error
+        finally:
+            self._dns_host = host
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        # TCP connect plus the TLS handshake for HTTPS
+        connection_timings.connect = time.perf_counter() - start - getattr(connection_timings, 'dns', 0.0)
+        connection_timings.new_connection = True
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+def reset_connection_timings():
+    connection_timings.dns = 0.0
+    connection_timings.connect = 0.0
+    connection_timings.new_connection = False
+
+class HttpClient:
+    # One long-lived, keep-alive session shared by every downloader in the process (the
+    # GUI's actions, batch novel workers, cover and image fetches), so connections and
+    # TLS sessions are reused instead of re-established per action. The pool holds at
+    # least as many connections as requests can be in flight, and every request gets
+    # explicit connect/read timeouts.
+    USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+    def __init__(self, pool_size=10, connect_timeout=10.0, read_timeout=30.0, compression=True):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = 0
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        # requests already offers gzip/deflate, plus br when the brotli package is installed
+        self.session.headers.update({
+            'User-Agent': self.USER_AGENT,
+            'Accept-Encoding': requests.utils.DEFAULT_ACCEPT_ENCODING if compression else 'identity',
+            'Connection': 'keep-alive'
+        })
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size):
+        # Only ever grows: remounting drops the idle connections of the old pool
+        with self.lock:
+            if pool_size <= self.pool_size:
+                return
+            self.pool_size = pool_size
+            for prefix in ('http://', 'https://'):
+                old_adapter = self.session.adapters.get(prefix)
+                self.session.mount(prefix, TimedHTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+                if old_adapter is not None:
+                    old_adapter.close()
+
+    def update_cookies(self, cookies):
+        self.session.cookies.update(cookies)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+class RunMetrics:
+    # Collects per-request and per-chapter timings for one run and writes them
+    # out as a JSON report with per-endpoint percentiles and throughput.
+    def __init__(self):
+        self.requests = []
+        self.chapters = {}
+        self.cache_hits = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+
+    def record_request(self, endpoint, method, status, dns, connect, ttfb, total, size, new_connection):
+        with self.lock:
+            self.requests.append({
+                'endpoint': endpoint,
+                'method': method,
+                'status': status,
+                'dns': dns,
+                'connect': connect,
+                'ttfb': ttfb,
+                'total': total,
+                'bytes': size,
+                'new_connection': new_connection
+            })
+
+    def record_cache_hit(self, endpoint):
+        with self.lock:
+            self.cache_hits[endpoint] = self.cache_hits.get(endpoint, 0) + 1
+
+    def record_chapter(self, number, stage, seconds):
+        with self.lock:
+            self.chapters.setdefault(number, {})[stage] = seconds
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        if not sorted_values:
+            return None
+        return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+    def distribution(self, values):
+        values = sorted(values)
+        if not values:
+            return {}
+        return {
+            'p50': self.percentile(values, 0.50),
+            'p95': self.percentile(values, 0.95),
+            'p99': self.percentile(values, 0.99),
+            'max': values[-1],
+            'mean': sum(values) / len(values)
+        }
+
+    def summary(self):
+        with self.lock:
+            requests_snapshot = list(self.requests)
+            chapters_snapshot = dict(self.chapters)
+            cache_hits = dict(self.cache_hits)
+        elapsed = time.perf_counter() - self.start
+
+        endpoints = {}
+        for endpoint in sorted({request['endpoint'] for request in requests_snapshot} | set(cache_hits)):
+            samples = [request for request in requests_snapshot if request['endpoint'] == endpoint]
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': sum(1 for request in samples if request['status'] is None or request['status'] >= 400),
+                'cache_hits': cache_hits.get(endpoint, 0),
+                'new_connections': sum(1 for request in samples if request['new_connection']),
+                'bytes': sum(request['bytes'] for request in samples),
+                'dns': self.distribution([request['dns'] for request in samples if request['new_connection']]),
+                'connect': self.distribution([request['connect'] for request in samples if request['new_connection']]),
+                'ttfb': self.distribution([request['ttfb'] for request in samples if request['ttfb'] is not None]),
+                'total': self.distribution([request['total'] for request in samples])
+            }
+
+        stages = {}
+        for timings in chapters_snapshot.values():
+            for stage, seconds in timings.items():
+                stages.setdefault(stage, []).append(seconds)
+
+        total_bytes = sum(request['bytes'] for request in requests_snapshot)
+        new_connections = sum(1 for request in requests_snapshot if request['new_connection'])
+        answered = sum(1 for request in requests_snapshot if request['status'] is not None)
+        chapter_count = sum(1 for timings in chapters_snapshot.values() if 'write' in timings)
+        return {
+            'started_at': self.started_at,
+            'elapsed': elapsed,
+            'chapters': chapter_count,
+            'requests': len(requests_snapshot),
+            'bytes': total_bytes,
+            'chapters_per_second': chapter_count / elapsed if elapsed else 0,
+            'bytes_per_second': total_bytes / elapsed if elapsed else 0,
+            'new_connections': new_connections,
+            # Share of answered requests that went over an already open connection
+            'connection_reuse': max(0, answered - new_connections) / answered if answered else None,
+            'endpoints': endpoints,
+            'chapter_stages': {stage: self.distribution(values) for stage, values in stages.items()}
+        }
+
+    def write_report(self, path):
+        summary = self.summary()
+        with self.lock:
+            report = dict(summary, request_log=list(self.requests),
+                          chapter_log={str(number): timings for number, timings in self.chapters.items()})
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        os.replace(temp_path, path)
+        return summary
+
+    @staticmethod
+    def summary_lines(summary):
+        def ms(distribution, key):
+            return f"{distribution[key] * 1000:.0f}" if distribution else "-"
+
+        lines = [f"Run metrics: {summary['chapters']} chapters in {summary['elapsed']:.1f}s "
+                 f"({summary['chapters_per_second']:.2f} chapters/s, {summary['bytes_per_second'] / 1024:.1f} KiB/s, "
+                 f"{summary['requests']} requests)",
+                 "  " + RunMetrics.connection_line(summary)]
+        for endpoint, stats in summary['endpoints'].items():
+            total = stats['total']
+            lines.append(f"  {endpoint}: {stats['requests']} requests, {stats['cache_hits']} cache hits, "
+                         f"{stats['errors']} errors, {stats['new_connections']} new connections, "
+                         f"p50/p95/p99 {ms(total, 'p50')}/{ms(total, 'p95')}/{ms(total, 'p99')} ms")
+        for stage, distribution in summary['chapter_stages'].items():
+            lines.append(f"  chapter {stage}: p50/p95/p99 {ms(distribution, 'p50')}/{ms(distribution, 'p95')}/{ms(distribution, 'p99')} ms")
+        return lines
+
+    @staticmethod
+    def connection_line(summary):
+        reuse = summary['connection_reuse']
+        reuse_text = f"{reuse * 100:.0f}% reused" if reuse is not None else "no requests sent"
+        return f"Connections: {summary['new_connections']} opened for {summary['requests']} requests ({reuse_text})"
+
+class RunProfiler:
+    # Before Python 3.12 cProfile only sees the thread it is enabled on, so every thread
+    # that runs profiled work gets its own profile and they are merged for the report.
+    # From 3.12 cProfile is built on sys.monitoring, which is process-wide: a second
+    # enabled profile raises ValueError, and the one enabled by the outermost call on the
+    # download thread already sees the workers. Profiling is best effort and never
+    # fails the run; if it cannot start, the work runs unprofiled.
+    PROCESS_WIDE = sys.version_info >= (3, 12)
+
+    def __init__(self):
+        self.local = threading.local()
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.active = 0
+
+    def wrap(self, func):
+        def profiled(*args, **kwargs):
+            profile = self.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stop(profile)
+        return profiled
+
+    def start(self):
+        # Returns the profile this call switched on, or None if it is nested in one
+        if self.PROCESS_WIDE:
+            with self.lock:
+                self.active += 1
+                if self.active > 1:
+                    return None
+                profile = cProfile.Profile()
+                if not self.enable(profile):
+                    return None
+                self.profiles.append(profile)
+                return profile
+
+        # Only the outermost profiled call on a thread switches its profiler on and off
+        depth = getattr(self.local, 'depth', 0)
+        self.local.depth = depth + 1
+        if depth:
+            return None
+        profile = getattr(self.local, 'profile', None)
+        if profile is None:
+            profile = cProfile.Profile()
+            if not self.enable(profile):
+                return None
+            self.local.profile = profile
+            with self.lock:
+                self.profiles.append(profile)
+            return profile
+        return profile if self.enable(profile) else None
+
+    def stop(self, profile):
+        if self.PROCESS_WIDE:
+            with self.lock:
+                self.active -= 1
+        else:
+            self.local.depth -= 1
+        if profile is not None:
+            profile.disable()
+
+    @staticmethod
+    def enable(profile):
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiler, debugger or coverage tool already holds the hooks
+            logging.warning(f"Profiling unavailable, continuing without it: {e}")
+            return False
+        return True
+
+    def write(self, path, top=25):
+        with self.lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return None
+        try:
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(path)
+        except (TypeError, OSError) as e:
+            logging.warning(f"Could not write profile to {path}: {e}")
+            return None
+
+        stream = io.StringIO()
+        pstats.Stats(path, stream=stream).sort_stats('cumulative').print_stats(top)
+        return stream.getvalue()
+
 class NovelpiaDownloader:
-    def __init__(self, novel_id, cookies, download_folder, download_interval, gui_logger):
+    BASE_URL = 'https://novelpia.com'
+
+    def __init__(self, novel_id, cookies, download_folder, download_interval, gui_logger, max_workers=1, max_in_flight=None,
+                 resume=False, build_epub=False, use_cache=True, image_workers=4, adaptive=True, max_rate=None,
+                 profile=False, base_url=None, storage='files', compress=False, client=None, search_index=None,
+                 parse_processes=0, controller=None, novel_info=None):
         self.novel_id = novel_id
         self.cookies = cookies
         self.download_folder = download_folder
         self.download_interval = download_interval
         self.gui_logger = gui_logger
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        self.session.cookies.update(self.cookies)
-        self.novel_info = {}
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.max_workers = max(1, max_workers)
+        # With parse_processes > 0 chapters go through the staged fetch -> parse -> write pipeline
+        self.parse_processes = parse_processes
+        # A controller passed in is shared with other downloaders (batch runs), and so is its rate limit
+        self.controller = controller or AdaptiveController.for_interval(
+            download_interval, max_in_flight or self.max_workers, gui_logger, max_rate=max_rate, adaptive=adaptive)
+        self.rate_limiter = self.controller.rate_limiter
+        # Every request goes through the rate limiter, so the pool never needs more connections
+        # than the controller may allow in flight
+        pool_size = self.controller.max_concurrency
+        self.client = client or HttpClient(pool_size)
+        self.client.ensure_pool_size(pool_size)
+        self.client.update_cookies(self.cookies)
+        self.session = self.client.session
+        # Info the caller already fetched (the GUI does before listing chapters) saves get_novel_info a request
+        self.novel_info = dict(novel_info) if novel_info else {}
+        self.resume = resume
+        self.build_epub = build_epub
+        self.metrics = RunMetrics()
+        self.profiler = RunProfiler() if profile else None
+        self.epub = None
+        self.manifest = None
+        self.store = None
+        self.search_index = search_index
+        self.cache = None
+        self.image_pipeline = ImagePipeline(self, os.path.join(download_folder, 'images'), image_workers)
+        if download_folder:
+            # 'packed' keeps every chapter in one SQLite file; 'files' is the classic chapters/*.txt layout
+            if storage == 'packed':
+                self.store = ChapterStore(self.storage_path(download_folder, novel_id, storage), compress)
+            else:
+                self.manifest = DownloadManifest(self.storage_path(download_folder, novel_id, storage))
+            if use_cache:
+                self.cache = ResponseCache(os.path.join(download_folder, '.cache'))
+
+    def _request(self, method, url, use_cache=True, **kwargs):
+        endpoint = self.cache.endpoint_for(url) if self.cache and use_cache else None
+        if endpoint is None:
+            return self._send(method, url, **kwargs)
+
+        key = self.cache.make_key(method, url, kwargs.get('data'))
+        entry = self.cache.lookup(key)
+        if entry and entry['fresh']:
+            response = self.cache.build_response(entry, url)
+            if response is not None:
+                self.cache.record('hits')
+                self.metrics.record_cache_hit(endpoint)
+                logging.debug(f"Cache hit for {method} {url}")
+                return response
+            entry = None
+
+        if entry:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **self.cache.validators(entry))
+        response = self._send(method, url, **kwargs)
+
+        if response.status_code == 304 and entry:
+            self.cache.refresh(key)
+            cached_response = self.cache.build_response(entry, url)
+            if cached_response is not None:
+                self.cache.record('revalidated')
+                logging.debug(f"Cache revalidated for {method} {url}")
+                return cached_response
+            # The body vanished underneath us; fetch it again without validators
+            kwargs['headers'] = {name: value for name, value in kwargs['headers'].items()
+                                 if name not in ('If-None-Match', 'If-Modified-Since')}
+            response = self._send(method, url, **kwargs)
+
+        self.cache.record('misses')
+        logging.debug(f"Cache miss for {method} {url}")
+        if self.cache.cacheable(endpoint, response):
+            self.cache.store(key, endpoint, url, response)
+        return response
+
+    def _send(self, method, url, **kwargs):
+        return self.controller.request(self._timed_request, method, url, **kwargs)
+
+    def _timed_request(self, method, url, **kwargs):
+        reset_connection_timings()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.client.request(method, url, **kwargs)
+            return response
+        finally:
+            # `elapsed` stops when the response headers are parsed, i.e. time to first byte
+            self.metrics.record_request(
+                endpoint_name(url), method, response.status_code if response is not None else None,
+                connection_timings.dns, connection_timings.connect,
+                response.elapsed.total_seconds() if response is not None else None,
+                time.perf_counter() - start, len(response.content) if response is not None else 0,
+                connection_timings.new_connection
+            )
+
+    def log_cache_stats(self):
+        if self.cache:
+            self.gui_logger(self.cache.stats())
+
+    def log_connection_stats(self):
+        self.gui_logger(RunMetrics.connection_line(self.metrics.summary()))
 
     def get_novel_info(self):
-        url = f"https://novelpia.com/novel/{self.novel_id}"
+        url = f"{self.base_url}/novel/{self.novel_id}"
         try:
-            response = self.session.get(url)
+            response = self._request('GET', url)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
         
@@ -62,49 +1797,75 @@ class NovelpiaDownloader:
             self.gui_logger(error_message)
             return None
 
-    def get_chapter_list(self):
-        chapters = []
-        page = 0
-        seen_chapter_ids = set()
+    def fetch_chapter_list_page(self, page, newest_first=False):
+        url = f"{self.base_url}/proc/episode_list"
+        data = {
+            'novel_no': self.novel_id,
+            'sort': 'UP' if newest_first else 'DOWN',
+            'page': page
+        }
+        logging.debug(f"Requesting chapter list page {page}")
+        # Newest-first pages are only used to poll for new chapters, so they must never come from the cache
+        send = self._send if newest_first else self._request
+        response = send('POST', url, data=data)
+        logging.debug(f"Response status code for page {page}: {response.status_code}")
+        response.raise_for_status()
+
+        chapter_matches = re.findall(r'id="bookmark_(\d+)"></i>(.+?)</b>', response.text)
+        logging.debug(f"Found {len(chapter_matches)} chapter matches on page {page}")
+        return chapter_matches
+
+    def get_chapter_list(self, on_chapters=None, page_window=None, fetch_page=None):
+        # fetch_page(page) replaces fetch_chapter_list_page, e.g. to draw on a request budget
+        fetch_page = fetch_page or self.fetch_chapter_list_page
+        chapters = ChapterIndex()
         consecutive_duplicate_pages = 0
         max_consecutive_duplicate_pages = 3
         chapter_number = 1
 
-        while True:
-            url = f"https://novelpia.com/proc/episode_list"
-            data = {
-                'novel_no': self.novel_id,
-                'sort': 'DOWN',
-                'page': page
-            }
-            try:
-                logging.debug(f"Requesting chapter list page {page}")
-                response = self.session.post(url, data=data)
-                logging.debug(f"Response status code: {response.status_code}")
-                response.raise_for_status()
-                
-                chapter_matches = re.findall(r'id="bookmark_(\d+)"></i>(.+?)</b>', response.text)
-                
-                logging.debug(f"Found {len(chapter_matches)} chapter matches on page {page}")
-                
+        # Keep a window of pages in flight and consume them strictly in page order,
+        # so numbering and duplicate detection behave exactly as a sequential crawl.
+        page_window = max(1, page_window or self.max_workers)
+        executor = ThreadPoolExecutor(max_workers=page_window)
+        pending = {}
+        next_page = 0
+
+        try:
+            while True:
+                while len(pending) < page_window:
+                    pending[next_page] = executor.submit(fetch_page, next_page)
+                    next_page += 1
+
+                page = min(pending)
+                try:
+                    chapter_matches = pending.pop(page).result()
+                except requests.RequestException as e:
+                    error_message = f"[ERROR] Error fetching chapter list: {e}"
+                    logging.error(error_message)
+                    self.gui_logger(error_message)
+                    break
+
                 if not chapter_matches:
                     logging.info("No more chapters found. Ending chapter list retrieval.")
                     break
 
-                new_chapters_on_page = False
+                new_chapters = []
+                new_chapter_ids = set()
                 for chapter_id, chapter_title in chapter_matches:
-                    if chapter_id not in seen_chapter_ids:
-                        seen_chapter_ids.add(chapter_id)
-                        new_chapters_on_page = True
-                        
+                    if chapter_id not in chapters and chapter_id not in new_chapter_ids:
+                        new_chapter_ids.add(chapter_id)
+
                         chapter_title = html.unescape(chapter_title.strip())
-                        
-                        chapters.append({'id': chapter_id, 'title': chapter_title, 'number': chapter_number})
+
+                        new_chapters.append(ChapterRecord(chapter_id, chapter_title, chapter_number))
                         logging.debug(f"Added chapter: Number {chapter_number}, ID {chapter_id}, Title: {chapter_title}")
                         chapter_number += 1
 
-                if new_chapters_on_page:
+                if new_chapters:
                     consecutive_duplicate_pages = 0
+                    chapters.extend(new_chapters)
+                    if on_chapters:
+                        on_chapters(new_chapters)
                 else:
                     consecutive_duplicate_pages += 1
                     logging.warning(f"No new chapters found on page {page}. Consecutive duplicate pages: {consecutive_duplicate_pages}")
@@ -112,65 +1873,278 @@ class NovelpiaDownloader:
                 if consecutive_duplicate_pages >= max_consecutive_duplicate_pages:
                     logging.info(f"Reached {max_consecutive_duplicate_pages} consecutive duplicate pages. Ending chapter list retrieval.")
                     break
-
-                page += 1
-            except requests.RequestException as e:
-                error_message = f"[ERROR] Error fetching chapter list: {e}"
-                logging.error(error_message)
-                self.gui_logger(error_message)
-                break
+        finally:
+            # Pages requested past the end are simply dropped
+            executor.shutdown(wait=False, cancel_futures=True)
 
         logging.info(f"Total unique chapters found: {len(chapters)}")
         return chapters
 
+    def viewer_data_url(self, chapter):
+        return f"{self.base_url}/proc/viewer_data/{chapter['id']}"
+
+    def fetch_chapter_payload(self, chapter):
+        # The network half of a chapter: its viewer_data items, ready for render_chapter
+        start = time.perf_counter()
+        # Without resume the chapter is being downloaded again on purpose, e.g. because it was revised,
+        # so an up to a week old cached copy won't do
+        response = self._request('GET', self.viewer_data_url(chapter), use_cache=self.resume)
+        response.raise_for_status()
+        logging.debug(f"Response status code for chapter {chapter['id']}: {response.status_code}")
+
+        data = response.json()
+        self.metrics.record_chapter(chapter['number'], 'fetch', time.perf_counter() - start)
+        if 's' in data and isinstance(data['s'], list):
+            return data['s']
+        raise ValueError(f"Unexpected response format for chapter {chapter['id']}")
+
+    def prefetch_images(self, image_sources):
+        # Start the downloads early; the pipeline dedups, so finish_chapter gets the same futures back
+        for source in image_sources:
+            self.image_pipeline.submit(urljoin(self.base_url, source))
+
+    def finish_chapter(self, chapter, chapter_text, image_sources):
+        # Images download in parallel while chapters are parsed; fill in their references once they land
+        start = time.perf_counter()
+        image_futures = [(urljoin(self.base_url, source), self.image_pipeline.submit(urljoin(self.base_url, source)))
+                         for source in image_sources]
+        for position, (img_url, future) in enumerate(image_futures):
+            img_filename = future.result()
+            chapter_text = chapter_text.replace(IMAGE_PLACEHOLDER.format(position), f"[Cover Image: {img_filename or img_url}]", 1)
+        if image_futures:
+            self.metrics.record_chapter(chapter['number'], 'image_wait', time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.save_chapter(chapter, chapter_text)
+        # Once saved, the cached viewer_data would only be read by a re-download, which bypasses it
+        self.invalidate_cached(self.viewer_data_url(chapter))
+        self.metrics.record_chapter(chapter['number'], 'write', time.perf_counter() - start)
+        self.gui_logger(f"Successfully downloaded and saved chapter {chapter['number']}: {chapter['title']}")
+
     def download_chapter(self, chapter):
-        url = f"https://novelpia.com/proc/viewer_data/{chapter['id']}"
+        url = self.viewer_data_url(chapter)
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            logging.debug(f"Response status code for chapter {chapter['id']}: {response.status_code}")
-            
-            data = response.json()
-            
-            if 's' in data and isinstance(data['s'], list):
-                chapter_content = []
-                for item in data['s']:
-                    text = item.get('text', '')
-                    text = html.unescape(text)
-                    
-                    text = text.replace('&nbsp;&nbsp;', '\n\n')
-                    text = text.replace('&nbsp;', '\n')
-                    
-                    paragraphs = text.split('\n')
-                    
-                    for para in paragraphs:
-                        soup = BeautifulSoup(para, 'html.parser')
-                        for img in soup.find_all('img', class_='cover-img'):
-                            img_url = urljoin('https://novelpia.com', img['src'])
-                            img_filename = f"chapter_{chapter['number']}_cover.jpg"
-                            self.download_image(img_url, img_filename)
-                            chapter_content.append(f"[Cover Image: {img_filename}]\n")
-                        processed_text = soup.get_text().strip()
-                        if processed_text:
-                            chapter_content.append(processed_text + '\n')
-
-                chapter_text = '\n'.join(chapter_content)
-                chapter_text = re.sub(r'\n{3,}', '\n\n', chapter_text)
-                chapter_text = f"Chapter {chapter['number']}: {chapter['title']}\n\n" + chapter_text
-
-                if not chapter_text.strip():
-                    raise ValueError("Chapter content is empty")
-
-                self.save_chapter(chapter, chapter_text)
-                self.gui_logger(f"Successfully downloaded and saved chapter {chapter['number']}: {chapter['title']}")
-            else:
-                raise ValueError(f"Unexpected response format for chapter {chapter['id']}")
-        except requests.RequestException as e:
-            self.handle_download_error(chapter, f"Error downloading chapter: {e}")
+            items = self.fetch_chapter_payload(chapter)
+            chapter_text, image_sources, parse_seconds = render_chapter(chapter, items)
+            self.metrics.record_chapter(chapter['number'], 'parse', parse_seconds)
+            self.finish_chapter(chapter, chapter_text, image_sources)
         except json.JSONDecodeError as e:
+            # requests.JSONDecodeError is also a RequestException, so this has to come first
+            self.invalidate_cached(url)
             self.handle_download_error(chapter, f"Error parsing JSON: {e}")
         except ValueError as e:
+            self.invalidate_cached(url)
             self.handle_download_error(chapter, str(e))
+        except requests.RequestException as e:
+            self.handle_download_error(chapter, f"Error downloading chapter: {e}")
+
+    def run_pipeline(self, chapters, chapter_done):
+        # Three stages so parsing never holds the GIL against the network:
+        #   fetch threads  -> viewer_data items -> parse processes (render_chapter)
+        #   -> one writer (this thread) that fills in images and saves chapters in order.
+        # A chapter takes a slot before it is fetched and gives it back once written, so at
+        # most `capacity` chapters are anywhere in the pipeline; slots are handed out in
+        # chapter order, so the next chapter the writer needs always holds one.
+        capacity = 2 * (self.max_workers + self.parse_processes)
+        slots = threading.Semaphore(capacity)
+        admission = threading.Lock()
+        todo = iter(enumerate(chapters))
+        fetched = queue.Queue(maxsize=self.max_workers)
+        parsed = queue.Queue(maxsize=capacity)
+
+        def fetch_worker():
+            while True:
+                with admission:
+                    slots.acquire()
+                    try:
+                        index, chapter = next(todo)
+                    except StopIteration:
+                        slots.release()
+                        return
+                self.gui_logger(f"Downloading chapter {chapter['number']}: {chapter['title']}")
+                try:
+                    fetched.put((index, chapter, self.fetch_chapter_payload(chapter), None))
+                except ValueError as e:
+                    # Before RequestException: requests.JSONDecodeError is both
+                    message = f"Error parsing JSON: {e}" if isinstance(e, json.JSONDecodeError) else str(e)
+                    fetched.put((index, chapter, None, (e, message)))
+                except requests.RequestException as e:
+                    fetched.put((index, chapter, None, (e, f"Error downloading chapter: {e}")))
+                except Exception as e:
+                    # Every chapter has to reach the writer, or it would wait for it forever
+                    logging.exception(f"Unexpected error while fetching chapter {chapter['id']}")
+                    fetched.put((index, chapter, None, (e, f"Unexpected error: {e}")))
+
+        if self.profiler:
+            fetch_worker = self.profiler.wrap(fetch_worker)
+
+        def dispatch(parse_pool):
+            # Hands fetched payloads to the parse processes as they arrive
+            for _ in range(len(chapters)):
+                index, chapter, items, error = fetched.get()
+                if error is not None:
+                    parsed.put((index, chapter, None, error))
+                    continue
+                try:
+                    future = parse_pool.submit(render_chapter, chapter, items)
+                except Exception as e:
+                    logging.exception(f"Could not hand chapter {chapter['id']} to a parse process")
+                    parsed.put((index, chapter, None, (e, f"Unexpected error: {e}")))
+                    continue
+                future.add_done_callback(
+                    lambda done: self.prefetch_images(done.result()[1]) if done.exception() is None else None
+                )
+                parsed.put((index, chapter, future, None))
+
+        fetch_threads = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(self.max_workers)]
+        # Fetch and image threads are already running here, and forking a threaded process can copy a held lock into
+        # the child, so the parse processes are spawned fresh
+        with ProcessPoolExecutor(max_workers=self.parse_processes,
+                                 mp_context=multiprocessing.get_context('spawn')) as parse_pool:
+            dispatcher = threading.Thread(target=dispatch, args=(parse_pool,), daemon=True)
+            for thread in fetch_threads + [dispatcher]:
+                thread.start()
+
+            ready = {}
+            for next_index, _ in enumerate(chapters):
+                while next_index not in ready:
+                    index, chapter, future, error = parsed.get()
+                    ready[index] = (chapter, future, error)
+                chapter, future, error = ready.pop(next_index)
+                self.write_pipelined_chapter(chapter, future, error)
+                slots.release()
+                chapter_done()
+
+            dispatcher.join()
+        for thread in fetch_threads:
+            thread.join()
+
+    def write_pipelined_chapter(self, chapter, future, error):
+        url = self.viewer_data_url(chapter)
+        if error is None:
+            try:
+                chapter_text, image_sources, parse_seconds = future.result()
+                self.metrics.record_chapter(chapter['number'], 'parse', parse_seconds)
+                self.finish_chapter(chapter, chapter_text, image_sources)
+                return
+            except ValueError as e:
+                error = (e, str(e))
+            except Exception as e:
+                logging.exception(f"Unexpected error while parsing chapter {chapter['id']}")
+                error = (e, f"Unexpected error: {e}")
+        exception, message = error
+        if isinstance(exception, ValueError) or not isinstance(exception, requests.RequestException):
+            self.invalidate_cached(url)
+        self.handle_download_error(chapter, message)
+
+    def invalidate_cached(self, url, method='GET', data=None):
+        # Drop a response we could not use, or one nothing will read again
+        if self.cache:
+            self.cache.invalidate(self.cache.make_key(method, url, data))
+
+    def download_chapters(self, chapters, progress_callback=None):
+        if self.profiler:
+            return self.profiler.wrap(self._download_chapters)(chapters, progress_callback)
+        return self._download_chapters(chapters, progress_callback)
+
+    def _download_chapters(self, chapters, progress_callback=None):
+        total_chapters = len(chapters)
+        pending_chapters = chapters
+        if self.resume and (self.manifest or self.store):
+            pending_chapters = [chapter for chapter in chapters if not self.is_downloaded(chapter)]
+            self.gui_logger(f"Resuming: skipping {total_chapters - len(pending_chapters)} chapters already downloaded, "
+                            f"{len(pending_chapters)} left to fetch.")
+        completed = total_chapters - len(pending_chapters)
+        if progress_callback and completed:
+            progress_callback(completed, total_chapters)
+
+        if self.build_epub:
+            self.start_epub()
+            # Chapters skipped by resume still belong in the book
+            pending_ids = {chapter['id'] for chapter in pending_chapters}
+            for chapter in chapters:
+                if chapter['id'] not in pending_ids:
+                    self.epub.add_chapter(chapter, self.read_chapter(chapter))
+
+        def chapter_done():
+            nonlocal completed
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total_chapters)
+
+        if self.parse_processes:
+            self.run_pipeline(pending_chapters, chapter_done)
+        else:
+            def worker(chapter, submitted_at):
+                self.metrics.record_chapter(chapter['number'], 'queue_wait', time.perf_counter() - submitted_at)
+                self.gui_logger(f"Downloading chapter {chapter['number']}: {chapter['title']}")
+                self.download_chapter(chapter)
+
+            if self.profiler:
+                worker = self.profiler.wrap(worker)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(worker, chapter, time.perf_counter()) for chapter in pending_chapters]
+                for future in as_completed(futures):
+                    future.result()
+                    chapter_done()
+
+        self.image_pipeline.save_index()
+        if self.epub:
+            self.finish_epub()
+        self.log_cache_stats()
+        if self.search_index:
+            self.gui_logger(self.search_index.stats())
+        self.gui_logger(f"Request controller: {self.controller.state()}")
+        self.write_metrics()
+
+        # Keep the caller's ordering regardless of completion order
+        return list(chapters)
+
+    def write_metrics(self):
+        if not self.download_folder:
+            return
+        os.makedirs(self.download_folder, exist_ok=True)
+        metrics_path = os.path.join(self.download_folder, f"{self.novel_id}_metrics.json")
+        summary = self.metrics.write_report(metrics_path)
+        for line in RunMetrics.summary_lines(summary):
+            self.gui_logger(line)
+        self.gui_logger(f"Metrics saved to {metrics_path}")
+
+        if self.profiler:
+            profile_path = os.path.join(self.download_folder, f"{self.novel_id}_profile.prof")
+            report = self.profiler.write(profile_path)
+            if report:
+                logging.info(report)
+                self.gui_logger(f"Profile saved to {profile_path}")
+
+    def start_epub(self):
+        os.makedirs(self.download_folder, exist_ok=True)
+        epub_path = os.path.join(self.download_folder, f"{self.novel_id}.epub")
+        self.epub = EpubWriter(epub_path, self.novel_id, os.path.join(self.download_folder, 'images'))
+
+        novel_info = self.novel_info or self.get_novel_info() or {}
+        cover_data, cover_media_type = None, 'image/jpeg'
+        if novel_info.get('cover_url'):
+            cover_data, cover_media_type = self.fetch_cover(novel_info['cover_url'])
+        self.epub.set_novel_info(novel_info, cover_data, cover_media_type)
+
+    def fetch_cover(self, cover_url):
+        # Returns (bytes, media type), or (None, None) if the cover couldn't be fetched
+        try:
+            response = self._request('GET', urljoin(self.base_url, cover_url))
+            response.raise_for_status()
+        except requests.RequestException as e:
+            error_message = f"[ERROR] Error downloading cover image: {e}"
+            logging.error(error_message)
+            self.gui_logger(error_message)
+            return None, None
+        return response.content, response.headers.get('Content-Type', 'image/jpeg').split(';')[0]
+
+    def finish_epub(self):
+        self.epub.close()
+        self.gui_logger(f"EPUB saved to {self.epub.path}")
+        self.epub = None
 
     def handle_download_error(self, chapter, error_message):
         error_log = f"[ERROR] Chapter {chapter['number']}: {chapter['title']} - {error_message}"
@@ -179,56 +2153,166 @@ class NovelpiaDownloader:
         placeholder_content = f"Chapter {chapter['number']}: {chapter['title']}\n\n[ERROR] This chapter could not be downloaded. Error: {error_message}"
         self.save_chapter(chapter, placeholder_content, is_error=True)
 
+    def chapter_path(self, chapter, is_error=False):
+        prefix = "ERROR_" if is_error else ""
+        # ChapterRecords carry their filename already; plain chapter dicts still work
+        filename = prefix + (chapter.get('filename') or f"{chapter['number']:04d}_{self.sanitize_filename(chapter['title'])}.txt")
+        return os.path.join(self.download_folder, 'chapters', filename)
+
+    @staticmethod
+    def storage_path(download_folder, novel_id, storage='files'):
+        # The packed chapter store, or the manifest of the chapters/*.txt layout
+        if storage == 'packed':
+            return os.path.join(download_folder, f"{novel_id}_chapters.sqlite")
+        return os.path.join(download_folder, f"{novel_id}_manifest.jsonl")
+
+    @staticmethod
+    def saved_chapter_ids(entries):
+        return {chapter_id for chapter_id, entry in entries.items() if entry['status'] == 'ok'}
+
+    def downloaded_chapter_ids(self):
+        # What the 'new' chapter selection is measured against
+        if self.store:
+            return self.saved_chapter_ids(self.store.entries())
+        if self.manifest:
+            return self.saved_chapter_ids(self.manifest.entries)
+        return set()
+
+    def is_downloaded(self, chapter):
+        if self.store:
+            return self.store.is_complete(chapter)
+        return self.manifest.is_complete(chapter, self.chapter_path(chapter))
+
+    def read_chapter(self, chapter):
+        if self.store:
+            return self.store.get(chapter['id'])
+        with open(self.chapter_path(chapter), 'r', encoding='utf-8') as f:
+            return f.read()
+
     def save_chapter(self, chapter, content, is_error=False):
-        chapter_dir = os.path.join(self.download_folder, 'chapters')
-        os.makedirs(chapter_dir, exist_ok=True)
+        if self.store:
+            self.store.put(chapter, content, 'error' if is_error else 'ok')
+        else:
+            self.save_chapter_file(chapter, content, is_error)
+
+        if self.epub:
+            self.epub.add_chapter(chapter, content)
+
+        if self.search_index and not is_error:
+            # The index keeps no copy of the text, only where it was saved, for snippets
+            source, store_id = (self.store.path, chapter['id']) if self.store else (self.chapter_path(chapter), None)
+            self.search_index.add(self.novel_id, chapter, content, self.novel_info.get('title'), source, store_id)
 
-        prefix = "ERROR_" if is_error else ""
-        filename = f"{prefix}{chapter['number']:04d}_{self.sanitize_filename(chapter['title'])}.txt"
-        filepath = os.path.join(chapter_dir, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
         if is_error:
             self.gui_logger(f"[ERROR] Saved placeholder for failed chapter {chapter['number']}: {chapter['title']}")
 
-    def download_image(self, img_url, img_filename):
+    def save_chapter_file(self, chapter, content, is_error=False):
+        filepath = self.chapter_path(chapter, is_error)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+        # Write to a temporary file first so an interrupted run never leaves a truncated chapter behind
+        temp_path = filepath + '.part'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, filepath)
+
+        # A successful download supersedes an earlier placeholder for the same chapter
+        if not is_error:
+            stale_path = self.chapter_path(chapter, is_error=True)
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+
+        if self.manifest:
+            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            self.manifest.record(chapter, 'error' if is_error else 'ok', content_hash, os.path.getsize(filepath),
+                                 os.path.basename(filepath))
+
+    def export_chapters(self):
+        # Write the packed store out in the loose chapters/*.txt layout
+        if not self.store:
+            return 0
+        exported = 0
+        for chapter, status, data in self.store.iter_chapters():
+            self.save_chapter_file(chapter, data.decode('utf-8'), is_error=status != 'ok')
+            exported += 1
+        self.gui_logger(f"Exported {exported} chapters to {os.path.join(self.download_folder, 'chapters')}")
+        return exported
+
+    def download_image(self, img_url, images_dir):
         try:
-            img_response = self.session.get(img_url)
+            img_response = self._request('GET', img_url)
             img_response.raise_for_status()
-            img_filepath = os.path.join(self.download_folder, 'images', img_filename)
-            os.makedirs(os.path.dirname(img_filepath), exist_ok=True)
-            with open(img_filepath, 'wb') as img_file:
-                img_file.write(img_response.content)
-            self.gui_logger(f"Successfully downloaded image: {img_filename}")
         except requests.RequestException as e:
-            error_message = f"[ERROR] Error downloading image {img_filename}: {e}"
+            error_message = f"[ERROR] Error downloading image {img_url}: {e}"
             logging.error(error_message)
             self.gui_logger(error_message)
+            return None
 
-    def compile_novel(self, chapters):
-        novel_content = []
-        for chapter in chapters:
-            prefix = "ERROR_"
-            filename = f"{prefix}{chapter['number']:04d}_{self.sanitize_filename(chapter['title'])}.txt"
-            filepath = os.path.join(self.download_folder, 'chapters', filename)
-        
-            if not os.path.exists(filepath):
-                filename = f"{chapter['number']:04d}_{self.sanitize_filename(chapter['title'])}.txt"
-                filepath = os.path.join(self.download_folder, 'chapters', filename)
+        content_type = img_response.headers.get('Content-Type', '').split(';')[0].strip()
+        extension = mimetypes.guess_extension(content_type) if content_type.startswith('image/') else None
+        extension = extension or os.path.splitext(urlparse(img_url).path)[1].lower() or '.jpg'
+        img_filename = hashlib.sha256(img_response.content).hexdigest()[:32] + extension
+        img_filepath = os.path.join(images_dir, img_filename)
+        if os.path.exists(img_filepath):
+            self.gui_logger(f"Image already stored: {img_filename}")
+            return img_filename
+
+        os.makedirs(images_dir, exist_ok=True)
+        temp_path = f"{img_filepath}.{threading.get_ident()}.part"
+        with open(temp_path, 'wb') as img_file:
+            img_file.write(img_response.content)
+        os.replace(temp_path, img_filepath)
+        self.gui_logger(f"Successfully downloaded image: {img_filename}")
+        return img_filename
+
+    def compile_sources(self, chapters):
+        # Where each chapter's text comes from, with enough metadata to tell whether it changed
+        sources = []
+        if self.store:
+            stored = self.store.entries()
+            store_name = os.path.basename(self.store.path)
+            for chapter in chapters:
+                entry = stored.get(chapter['id'])
+                if entry is None:
+                    error_message = f"[ERROR] Chapter not found in store: {chapter['number']}: {chapter['title']}"
+                    logging.warning(error_message)
+                    self.gui_logger(error_message)
+                    continue
+                sources.append({'id': chapter['id'], 'number': chapter['number'], 'title': chapter['title'],
+                                'file': store_name, 'size': entry['size'], 'mtime_ns': entry['updated_ns']})
+            return sources
+
+        # List the chapter folder once instead of probing two filenames per chapter
+        chapter_dir = os.path.join(self.download_folder, 'chapters')
+        try:
+            available_files = {entry.name: entry for entry in os.scandir(chapter_dir)}
+        except FileNotFoundError:
+            available_files = {}
 
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    chapter_content = f.read()
-                novel_content.append(chapter_content)
-                self.gui_logger(f"Added chapter {chapter['number']} to compilation: {chapter['title']}")
-            except FileNotFoundError:
-                error_message = f"[ERROR] Chapter file not found: {filepath}"
+        for chapter in chapters:
+            entry = available_files.get(os.path.basename(self.chapter_path(chapter, is_error=True)))
+            if entry is None:
+                entry = available_files.get(os.path.basename(self.chapter_path(chapter)))
+            if entry is None:
+                error_message = f"[ERROR] Chapter file not found: {self.chapter_path(chapter)}"
                 logging.warning(error_message)
                 self.gui_logger(error_message)
+                continue
+
+            stat = entry.stat()
+            sources.append({
+                'id': chapter['id'],
+                'number': chapter['number'],
+                'title': chapter['title'],
+                'file': entry.name,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns
+            })
+        return sources
 
-        if not novel_content:
+    def compile_novel(self, chapters):
+        sources = self.compile_sources(chapters)
+        if not sources:
             error_message = "[ERROR] No chapters were found for compilation."
             logging.error(error_message)
             self.gui_logger(error_message)
@@ -236,15 +2320,416 @@ class NovelpiaDownloader:
 
         novel_filename = f"{self.novel_id}_complete.txt"
         novel_filepath = os.path.join(self.download_folder, novel_filename)
-        with open(novel_filepath, 'w', encoding='utf-8') as f:
-            f.write('\n\n'.join(novel_content))
+        index_filepath = os.path.join(self.download_folder, f"{self.novel_id}_complete.index.json")
+
+        # Reuse the leading chapters that are unchanged since the last compilation and
+        # only rewrite the file from the first new, replaced or removed chapter onwards
+        previous_entries = self.load_compile_index(index_filepath, novel_filepath)
+        reused = 0
+        for old, new in zip(previous_entries, sources):
+            if any(old[key] != new[key] for key in ('id', 'file', 'size', 'mtime_ns')):
+                break
+            reused += 1
+
+        if reused == len(previous_entries) == len(sources):
+            self.gui_logger(f"Compiled novel is already up to date: {novel_filepath}")
+            return
+
+        separator = (os.linesep * 2).encode('utf-8')
+        chapter_dir = os.path.join(self.download_folder, 'chapters')
+        entries = previous_entries[:reused]
+        offset = entries[-1]['offset'] + entries[-1]['length'] if entries else 0
+
+        with open(novel_filepath, 'r+b' if entries else 'wb') as novel_file:
+            novel_file.seek(offset)
+            novel_file.truncate()
+            for source in sources[reused:]:
+                if offset:
+                    novel_file.write(separator)
+                    offset += len(separator)
+                if self.store:
+                    # Stored text has bare newlines; match what a text-mode chapter file would contain
+                    data = self.store.get_bytes(source['id'])
+                    if os.linesep != '\n':
+                        data = data.replace(b'\n', os.linesep.encode('utf-8'))
+                    novel_file.write(data)
+                    length = len(data)
+                else:
+                    with open(os.path.join(chapter_dir, source['file']), 'rb') as chapter_file:
+                        shutil.copyfileobj(chapter_file, novel_file, 1024 * 1024)
+                    length = source['size']
+                entries.append(dict(source, offset=offset, length=length))
+                offset += length
+                self.gui_logger(f"Added chapter {source['number']} to compilation: {source['title']}")
+
+        temp_path = index_filepath + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'novel_id': self.novel_id, 'size': offset, 'chapters': entries}, f, ensure_ascii=False)
+        os.replace(temp_path, index_filepath)
+
+        if reused:
+            self.gui_logger(f"Reused {reused} previously compiled chapters, wrote {len(sources) - reused}.")
         self.gui_logger(f"Compiled novel saved to {novel_filepath}")
 
+    def load_compile_index(self, index_filepath, novel_filepath):
+        try:
+            with open(index_filepath, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            # The index is only trusted if the compiled file is exactly as it left it
+            if os.path.getsize(novel_filepath) != index['size']:
+                return []
+            return index['chapters']
+        except (OSError, ValueError, KeyError):
+            return []
+
     @staticmethod
     def sanitize_filename(filename):
-        return re.sub(r'[\\/*?:"<>|]', '', filename)
+        return sanitize_filename(filename)
+
+class LibraryWatcher:
+    # Keeps a list of tracked novels current with as little traffic as possible. A check
+    # fetches only the first newest-first episode_list page and pages further only while
+    # every chapter on it is unknown; then just the new chapters are downloaded. Each
+    # novel is polled on its own interval, stretched up to max_backoff times while it
+    # stays quiet, and every poll request draws on one shared hourly budget.
+    def __init__(self, novels, make_downloader, output, logger, request_budget=None, max_backoff=4.0):
+        self.intervals = dict(novels)  # novel_id -> base poll interval in seconds
+        self.make_downloader = make_downloader
+        self.output = output
+        self.logger = logger
+        self.max_backoff = max_backoff
+        # Bursts of up to a minute's worth of requests, on average request_budget per hour
+        self.budget = RateLimiter(request_budget / 3600, burst=max(1, int(request_budget / 60))) if request_budget else None
+        self.stop_event = threading.Event()
+
+    def state_path(self, novel_id):
+        return os.path.join(self.output, novel_id, f"{novel_id}_watch.json")
+
+    def load_state(self, novel_id):
+        try:
+            with open(self.state_path(novel_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_state(self, novel_id, chapters):
+        path = self.state_path(novel_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'novel_id': novel_id, 'checked_at': time.time(), 'chapters': chapters.to_dicts()}, f,
+                      ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def fetch_page(self, downloader, page, newest_first=True):
+        if self.budget is None:
+            return downloader.fetch_chapter_list_page(page, newest_first=newest_first)
+        with self.budget:
+            return downloader.fetch_chapter_list_page(page, newest_first=newest_first)
+
+    def find_new_chapters(self, downloader, known_chapters):
+        fresh = {}  # newest first
+        page = 0
+        while True:
+            chapter_matches = self.fetch_page(downloader, page)
+            unknown = [(chapter_id, title) for chapter_id, title in chapter_matches
+                       if chapter_id not in known_chapters and chapter_id not in fresh]
+            fresh.update(unknown)
+            # A known chapter on the page means everything newer has been seen now
+            if not chapter_matches or len(unknown) < len(chapter_matches):
+                break
+            page += 1
+
+        next_number = known_chapters.last_number() + 1
+        return [ChapterRecord(chapter_id, html.unescape(title.strip()), next_number + offset)
+                for offset, (chapter_id, title) in enumerate(reversed(list(fresh.items())))]
+
+    def check(self, novel_id):
+        # Returns the number of new chapters, or None if the check failed
+        downloader = self.make_downloader(novel_id)
+        state = self.load_state(novel_id)
+        try:
+            if state is None:
+                # Never checked before: one full crawl to learn the chapter list, paced by the budget too
+                self.logger(f"[{novel_id}] First check, fetching the full chapter list")
+                known_chapters = ChapterIndex()
+                new_chapters = downloader.get_chapter_list(
+                    fetch_page=lambda page: self.fetch_page(downloader, page, newest_first=False))
+                if not new_chapters:
+                    return None
+            else:
+                known_chapters = ChapterIndex(state['chapters'])
+                new_chapters = self.find_new_chapters(downloader, known_chapters)
+        except requests.RequestException as e:
+            self.logger(f"[{novel_id}] [ERROR] Checking for new chapters failed: {e}")
+            return None
+
+        # Chapters seen before whose download failed are retried on every check, new chapters or not
+        saved_ids = downloader.downloaded_chapter_ids()
+        failed_chapters = [chapter for chapter in known_chapters if chapter['id'] not in saved_ids]
+        if not new_chapters and not failed_chapters:
+            self.logger(f"[{novel_id}] No new chapters")
+            return 0
+
+        if new_chapters:
+            self.logger(f"[{novel_id}] {len(new_chapters)} new chapters: {new_chapters[0]['number']}-{new_chapters[-1]['number']}")
+        if failed_chapters:
+            self.logger(f"[{novel_id}] Retrying {len(failed_chapters)} chapters that failed before")
+        chapters = known_chapters + new_chapters
+        # The downloader resumes, so only new and failed chapters are fetched while the EPUB and compilation cover all of them
+        downloaded_chapters = downloader.download_chapters(chapters)
+        downloader.compile_novel(downloaded_chapters)
+        self.save_state(novel_id, chapters)
+        return len(new_chapters)
+
+    def run(self, max_checks=None):
+        # Earliest due check first; returns when stopped or after max_checks checks
+        current_intervals = dict(self.intervals)
+        schedule = [(time.time(), novel_id) for novel_id in self.intervals]
+        heapq.heapify(schedule)
+        checks = 0
+        while schedule and (max_checks is None or checks < max_checks):
+            due, novel_id = heapq.heappop(schedule)
+            if self.stop_event.wait(max(0.0, due - time.time())):
+                break
+
+            try:
+                new_count = self.check(novel_id)
+            except Exception as e:
+                logging.exception(f"Unexpected error while checking novel {novel_id}")
+                self.logger(f"[{novel_id}] [ERROR] {e}")
+                new_count = None
+            checks += 1
+
+            base_interval = self.intervals[novel_id]
+            if new_count:
+                current_intervals[novel_id] = base_interval
+            elif new_count == 0:
+                current_intervals[novel_id] = min(current_intervals[novel_id] * 1.5, base_interval * self.max_backoff)
+            heapq.heappush(schedule, (time.time() + current_intervals[novel_id], novel_id))
+            logging.debug(f"Next check of {novel_id} in {current_intervals[novel_id]:.0f}s")
+        return checks
+
+    def stop(self):
+        self.stop_event.set()
+
+class ThumbnailCache:
+    # Cover thumbnails on disk, keyed by cover URL, so a novel opened before shows its
+    # cover without a network request. Thumbnails are stored as small PNGs.
+    SIZE = (150, 200)
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest()[:32] + '.png')
+
+    def get(self, url):
+        try:
+            with open(self.path(url), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, url, image_data):
+        # Decoding and resizing happen on the caller's (worker) thread; only the thumbnail is kept
+        img = Image.open(BytesIO(image_data))
+        img.thumbnail(self.SIZE)
+        if img.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            img = img.convert('RGBA')
+        output = BytesIO()
+        img.save(output, 'PNG')
+        thumbnail = output.getvalue()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        filepath = self.path(url)
+        temp_path = f"{filepath}.{threading.get_ident()}.part"
+        with open(temp_path, 'wb') as f:
+            f.write(thumbnail)
+        os.replace(temp_path, filepath)
+        return thumbnail
+
+class VirtualListbox:
+    # A Listbox that only ever holds the rows currently on screen. Row text comes from
+    # row_text(index) when a row scrolls into view and the selection is kept as a set of
+    # indices, so a list of 10,000 chapters costs no more to show than a screenful.
+    # Mouse and keyboard handling mirrors an EXTENDED-mode Listbox.
+    def __init__(self, master, row_text):
+        self.row_text = row_text
+        self.count = 0
+        self.top = 0
+        self.rows = 1
+        self.selected = set()
+        self.anchor = 0
+        self.active = 0
+
+        self.frame = ttk.Frame(master)
+        self.listbox = tk.Listbox(self.frame, selectmode=tk.EXTENDED, exportselection=False, activestyle='none')
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Same row pitch Tk uses internally for a listbox line
+        font = tkfont.Font(font=self.listbox.cget('font'))
+        self.line_height = font.metrics('linespace') + 1 + 2 * int(self.listbox.cget('selectborderwidth'))
+        self.padding = int(self.listbox.cget('borderwidth')) + int(self.listbox.cget('highlightthickness'))
+
+        bindings = {
+            "<Configure>": self.on_resize,
+            "<Button-1>": self.on_click,
+            "<Shift-Button-1>": lambda event: self.on_click(event, extend=True),
+            "<Control-Button-1>": lambda event: self.on_click(event, toggle=True),
+            "<B1-Motion>": self.on_drag,
+            "<MouseWheel>": self.on_wheel,
+            "<Button-4>": lambda event: self.scroll(-3),
+            "<Button-5>": lambda event: self.scroll(3),
+            "<Up>": lambda event: self.move_active(-1),
+            "<Down>": lambda event: self.move_active(1),
+            "<Shift-Up>": lambda event: self.move_active(-1, extend=True),
+            "<Shift-Down>": lambda event: self.move_active(1, extend=True),
+            "<Prior>": lambda event: self.move_active(-self.rows),
+            "<Next>": lambda event: self.move_active(self.rows),
+            "<Home>": lambda event: self.move_active(-self.count),
+            "<End>": lambda event: self.move_active(self.count),
+            "<Control-a>": self.select_all,
+        }
+        for sequence, handler in bindings.items():
+            self.listbox.bind(sequence, handler)
+        # Keep the Listbox class bindings from scrolling or selecting the few rows it holds on its own
+        for sequence in ("<B1-Leave>", "<B1-Enter>", "<ButtonRelease-1>", "<Double-Button-1>", "<Left>", "<Right>"):
+            self.listbox.bind(sequence, lambda event: "break")
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_count(self, count, reset=False):
+        # The rows themselves live with the caller; only the count is needed to lay them out
+        self.count = count
+        if reset:
+            self.top = self.anchor = self.active = 0
+            self.selected.clear()
+        self.render()
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def select_all(self, event=None):
+        self.selected = set(range(self.count))
+        self.render()
+        return "break"
+
+    def set_selection(self, indices):
+        self.selected = set(indices)
+        if self.selected:
+            # Bring the first selected row into view
+            self.top = self.anchor = self.active = min(self.selected)
+        self.render()
+
+    def render(self):
+        self.top = max(0, min(self.top, self.count - self.rows))
+        end = min(self.count, self.top + self.rows + 1)  # one extra for the partially visible last row
+
+        self.listbox.delete(0, tk.END)
+        if end > self.top:
+            self.listbox.insert(tk.END, *[self.row_text(index) for index in range(self.top, end)])
+        for index in range(self.top, end):
+            if index in self.selected:
+                self.listbox.selection_set(index - self.top)
+        self.listbox.yview_moveto(0)
+
+        if self.count:
+            self.scrollbar.set(self.top / self.count, min(1.0, (self.top + self.rows) / self.count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        # Scrollbar command protocol: ('moveto', fraction) or ('scroll', amount, 'units' | 'pages')
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * self.count)
+            self.render()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            self.scroll(amount * self.rows if args[2] == 'pages' else amount)
+
+    def scroll(self, lines):
+        self.top += lines
+        self.render()
+        return "break"
+
+    def on_resize(self, event):
+        rows = max(1, (event.height - 2 * self.padding) // self.line_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.render()
+
+    def on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small raw deltas
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll(-3 * notches)
+
+    def index_at(self, y):
+        index = self.top + max(0, y - self.padding) // self.line_height
+        return min(index, self.count - 1)
+
+    def on_click(self, event, extend=False, toggle=False):
+        self.listbox.focus_set()
+        if not self.count:
+            return "break"
+        index = self.index_at(event.y)
+        if extend:
+            self.select_range(self.anchor, index)
+        elif toggle:
+            self.selected ^= {index}
+            self.anchor = index
+        else:
+            self.selected = {index}
+            self.anchor = index
+        self.active = index
+        self.render()
+        return "break"
+
+    def on_drag(self, event):
+        if not self.count:
+            return "break"
+        if event.y < 0:
+            self.top -= 1
+        elif event.y > self.listbox.winfo_height():
+            self.top += 1
+        self.top = max(0, min(self.top, self.count - self.rows))
+        self.active = self.index_at(min(max(event.y, 0), self.listbox.winfo_height()))
+        self.select_range(self.anchor, self.active)
+        self.render()
+        return "break"
+
+    def move_active(self, step, extend=False):
+        if not self.count:
+            return "break"
+        self.active = max(0, min(self.count - 1, self.active + step))
+        if extend:
+            self.select_range(self.anchor, self.active)
+        else:
+            self.selected = {self.active}
+            self.anchor = self.active
+        # Scroll just far enough to keep the active row on screen
+        if self.active < self.top:
+            self.top = self.active
+        elif self.active >= self.top + self.rows:
+            self.top = self.active - self.rows + 1
+        self.render()
+        return "break"
+
+    def select_range(self, first, last):
+        if first > last:
+            first, last = last, first
+        self.selected = set(range(first, last + 1))
 
 class NovelpiaDownloaderGUI:
+    # The log widget keeps only the newest LOG_LINES lines; everything also goes to LOG_FILE
+    LOG_LINES = 5000
+    LOG_FILE = os.path.join(APP_DIR, 'gui.log')
+    # How often queued worker messages are applied to the widgets, in milliseconds
+    FRAME_INTERVAL = 50
+
     def __init__(self, root):
         self.root = root
         self.root.title("Novelpia Download Helper")
@@ -252,6 +2737,15 @@ class NovelpiaDownloaderGUI:
         
         self.queue = queue.Queue()
         self.thread = None
+        # Shared by every fetch, download and cover load so connections stay warm between actions
+        self.client = HttpClient()
+        # Every chapter the GUI downloads, whatever folder it goes to, is searchable from here. Opened on
+        # first index or search, so the GUI still starts where SQLite was built without FTS5
+        self.search_index = None
+        self.search_index_lock = threading.Lock()
+        # The last fetched novel's info, handed to its download so the EPUB and search index get the title
+        self.novel_info_id = None
+        self.novel_info = None
         # Create main frame
         main_frame = ttk.Frame(root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -278,6 +2772,28 @@ class NovelpiaDownloaderGUI:
         self.entry_download_interval = ttk.Entry(input_frame)
         self.entry_download_interval.grid(row=3, column=1, sticky="we", padx=5, pady=5)
 
+        ttk.Label(input_frame, text="Concurrent Workers:").grid(row=4, column=0, sticky="w", padx=5, pady=5)
+        self.entry_workers = ttk.Entry(input_frame)
+        self.entry_workers.insert(0, "1")
+        self.entry_workers.grid(row=4, column=1, sticky="we", padx=5, pady=5)
+
+        ttk.Label(input_frame, text="Max Requests/Second (blank for default):").grid(row=5, column=0, sticky="w", padx=5, pady=5)
+        self.entry_max_rate = ttk.Entry(input_frame)
+        self.entry_max_rate.grid(row=5, column=1, sticky="we", padx=5, pady=5)
+
+        self.adaptive_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(input_frame, text="Adaptive throttle (slow down on errors, speed up when healthy)", variable=self.adaptive_var).grid(row=6, column=1, sticky="w", padx=5, pady=5)
+        self.resume_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(input_frame, text="Resume (skip chapters already downloaded)", variable=self.resume_var).grid(row=7, column=1, sticky="w", padx=5, pady=5)
+        self.epub_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(input_frame, text="Build EPUB", variable=self.epub_var).grid(row=8, column=1, sticky="w", padx=5, pady=5)
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(input_frame, text="Profile download (cProfile)", variable=self.profile_var).grid(row=9, column=1, sticky="w", padx=5, pady=5)
+        self.packed_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(input_frame, text="Packed chapter store (one compressed SQLite file per novel)", variable=self.packed_var).grid(row=10, column=1, sticky="w", padx=5, pady=5)
+        self.index_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(input_frame, text="Index chapters for library search", variable=self.index_var).grid(row=11, column=1, sticky="w", padx=5, pady=5)
+
         input_frame.columnconfigure(1, weight=1)
 
         # Buttons
@@ -286,6 +2802,11 @@ class NovelpiaDownloaderGUI:
 
         ttk.Button(button_frame, text="Fetch Novel Info & List Chapters", command=self.fetch_novel_info_and_chapters).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Download Selected Chapters", command=self.download_selected_chapters).pack(side=tk.LEFT, padx=5)
+        ttk.Label(button_frame, text="Select (e.g. 100-500, /외전/, new):").pack(side=tk.LEFT, padx=5)
+        self.entry_selection = ttk.Entry(button_frame, width=30)
+        self.entry_selection.pack(side=tk.LEFT, padx=5)
+        self.entry_selection.bind("<Return>", lambda event: self.select_chapters())
+        ttk.Button(button_frame, text="Select", command=self.select_chapters).pack(side=tk.LEFT, padx=5)
 
         # Novel Info Frame
         self.novel_info_frame = ttk.Frame(main_frame)
@@ -312,13 +2833,29 @@ class NovelpiaDownloaderGUI:
         list_frame = ttk.Frame(main_frame)
         list_frame.pack(fill=tk.BOTH, expand=True, pady=5)
 
-        self.chapter_listbox = tk.Listbox(list_frame, selectmode=tk.EXTENDED)
-        self.chapter_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.chapter_listbox.bind("<Shift-Button-1>", self.mouse_select)
-
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.chapter_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.chapter_listbox.config(yscrollcommand=scrollbar.set)
+        self.chapter_listbox = VirtualListbox(list_frame, self.chapter_row_text)
+        self.chapter_listbox.pack(fill=tk.BOTH, expand=True)
+
+        # Library search
+        search_frame = ttk.Frame(main_frame)
+        search_frame.pack(fill=tk.X, pady=5)
+
+        search_bar = ttk.Frame(search_frame)
+        search_bar.pack(fill=tk.X)
+        ttk.Label(search_bar, text="Search Library:").pack(side=tk.LEFT, padx=5)
+        self.entry_search = ttk.Entry(search_bar)
+        self.entry_search.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.entry_search.bind("<Return>", lambda event: self.search_library())
+        ttk.Button(search_bar, text="Search", command=self.search_library).pack(side=tk.LEFT, padx=5)
+
+        self.search_results = tk.Text(search_frame, height=6, wrap=tk.NONE)
+        self.search_results.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.search_results.tag_configure("match", background="yellow")
+        self.search_results.tag_configure("heading", font=("TkDefaultFont", 9, "bold"))
+        self.search_results.config(state=tk.DISABLED)
+        search_scrollbar = ttk.Scrollbar(search_frame, orient=tk.VERTICAL, command=self.search_results.yview)
+        search_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.search_results.config(yscrollcommand=search_scrollbar.set)
 
         # Progress bar
         self.progress_var = tk.DoubleVar()
@@ -338,7 +2875,23 @@ class NovelpiaDownloaderGUI:
         log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.log_text.config(yscrollcommand=log_scrollbar.set)
 
-        self.chapters = []  # Store the full chapter list
+        self.chapters = ChapterIndex()  # Store the full chapter list
+
+        # Covers are fetched and thumbnailed on this worker, never on the Tk thread
+        self.thumbnails = ThumbnailCache(os.path.join(APP_DIR, 'thumbnails'))
+        self.cover_executor = ThreadPoolExecutor(max_workers=1)
+        self.cover_url = None
+
+        # Log lines queued since the last frame, and the file that receives the full log
+        self.pending_log = []
+        try:
+            os.makedirs(APP_DIR, exist_ok=True)
+            self.log_file = open(self.LOG_FILE, 'a', encoding='utf-8')
+        except OSError as e:
+            logging.warning(f"Could not open GUI log file {self.LOG_FILE}: {e}")
+            self.log_file = None
+
+        self.root.after(self.FRAME_INTERVAL, self.process_queue)
 
     def fetch_novel_info_and_chapters(self):
         novel_id = self.entry_novel_id.get()
@@ -349,31 +2902,46 @@ class NovelpiaDownloaderGUI:
             return
 
         try:
-            cookies = json.loads(cookies_json)
-            cookies_dict = {cookie['name']: cookie['value'] for cookie in cookies}
+            cookies_dict = parse_cookies(cookies_json)
         except json.JSONDecodeError:
             messagebox.showerror("Invalid JSON", "The cookies JSON is not valid.")
             return
 
-        self.thread = threading.Thread(target=self._fetch_novel_info_and_chapters_thread, args=(novel_id, cookies_dict))
+        try:
+            max_workers = int(self.entry_workers.get() or 1)
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Concurrent workers must be a whole number.")
+            return
+
+        download_folder = self.entry_download_folder.get()
+        self.thread = threading.Thread(target=self._fetch_novel_info_and_chapters_thread,
+                                       args=(novel_id, cookies_dict, download_folder, max_workers))
         self.thread.start()
-        self.root.after(100, self.process_queue)
 
-    def _fetch_novel_info_and_chapters_thread(self, novel_id, cookies):
-        downloader = NovelpiaDownloader(novel_id, cookies, "", 0, self.queue_log_action)
+    def _fetch_novel_info_and_chapters_thread(self, novel_id, cookies, download_folder, max_workers):
+        # With a download folder set, the fetched pages land in its response cache and the download reuses them
+        downloader = NovelpiaDownloader(novel_id, cookies, download_folder, 0, self.queue_log_action, max_workers=max_workers,
+                                        client=self.client)
         novel_info = downloader.get_novel_info()
 
         if novel_info:
-            self.queue.put(("update_novel_info", novel_info))
+            self.queue.put(("update_novel_info", novel_id, novel_info))
             self.queue_log_action("Novel information fetched successfully.")
+            if novel_info['cover_url']:
+                self.cover_executor.submit(self.load_cover_thumbnail, downloader, novel_info['cover_url'])
             
-            # Fetch chapter list
-            chapters = downloader.get_chapter_list()
-            self.queue.put(("update_chapter_list", chapters))
+            # Fetch chapter list, streaming each page into the listbox as it arrives
+            self.queue.put(("update_chapter_list", []))
+            chapters = downloader.get_chapter_list(lambda new_chapters: self.queue.put(("append_chapters", new_chapters)))
+            self.queue_log_action(f"Found {len(chapters)} chapters.")
+            downloader.log_cache_stats()
+            downloader.log_connection_stats()
         else:
             self.queue_log_action("[ERROR] Failed to fetch novel information.")
 
-    def update_novel_info(self, novel_info):
+    def update_novel_info(self, novel_id, novel_info):
+        self.novel_info_id = novel_id
+        self.novel_info = novel_info
         self.title_label.config(text=f"Title: {novel_info['title']}")
 
         self.synopsis_text.config(state=tk.NORMAL)
@@ -381,33 +2949,111 @@ class NovelpiaDownloaderGUI:
         self.synopsis_text.insert(tk.END, novel_info['synopsis'])
         self.synopsis_text.config(state=tk.DISABLED)
 
-        if novel_info['cover_url']:
-            self.load_cover_image(novel_info['cover_url'])
+        # The thumbnail arrives later as a "show_cover" message; clear the previous novel's cover meanwhile
+        self.cover_url = novel_info['cover_url']
+        self.cover_label.config(image='')
+        self.cover_label.image = None
 
-    def load_cover_image(self, url):
+    def load_cover_thumbnail(self, downloader, cover_url):
+        # Runs on the cover worker, using the downloader's session and cookies
+        url = urljoin(downloader.base_url, cover_url)
         try:
-            # Add scheme if it's missing
-            if url.startswith('//'):
-                url = 'https:' + url
-            elif not url.startswith(('http://', 'https://')):
-                url = urljoin('https://novelpia.com', url)
-
-            response = requests.get(url)
-            img_data = BytesIO(response.content)
-            img = Image.open(img_data)
-            img.thumbnail((150, 200))  # Resize the image
-            photo = ImageTk.PhotoImage(img)
-            self.cover_label.config(image=photo)
-            self.cover_label.image = photo  # Keep a reference
+            thumbnail = self.thumbnails.get(url)
+            if thumbnail is None:
+                image_data, _ = downloader.fetch_cover(cover_url)
+                if image_data is None:
+                    return
+                thumbnail = self.thumbnails.put(url, image_data)
+            self.queue.put(("show_cover", (cover_url, thumbnail)))
         except Exception as e:
-            self.log_action(f"[ERROR] Failed to load cover image: {e}")
+            self.queue_log_action(f"[ERROR] Failed to load cover image: {e}")
+
+    def show_cover(self, cover_url, thumbnail):
+        if cover_url != self.cover_url:
+            return  # a different novel was opened in the meantime
+        photo = ImageTk.PhotoImage(Image.open(BytesIO(thumbnail)))
+        self.cover_label.config(image=photo)
+        self.cover_label.image = photo  # Keep a reference
+
+    def chapter_row_text(self, index):
+        chapter = self.chapters[index]
+        return f"{chapter['number']:04d} - {chapter['title']}"
 
     def update_chapter_list(self):
-        self.chapter_listbox.delete(0, tk.END)
-        for chapter in self.chapters:
-            self.chapter_listbox.insert(tk.END, f"{chapter['number']:04d} - {chapter['title']}")
-        
-        self.log_action(f"Found {len(self.chapters)} chapters.")
+        self.chapter_listbox.set_count(len(self.chapters), reset=True)
+
+    def append_chapters(self, chapters):
+        self.chapters.extend(chapters)
+        self.chapter_listbox.set_count(len(self.chapters))
+
+    def select_chapters(self):
+        spec = self.entry_selection.get().strip()
+        if not spec:
+            return
+        try:
+            records = self.chapters.select(spec, known=self.downloaded_chapter_ids())
+        except (ValueError, re.error) as e:
+            messagebox.showerror("Invalid Selection", f"Could not understand the selection: {e}")
+            return
+        self.chapter_listbox.set_selection(self.chapters.position(record.id) for record in records)
+        self.log_action(f"Selected {len(records)} chapters.")
+
+    def downloaded_chapter_ids(self):
+        # Chapters already saved in the download folder, for 'new' in the Select box
+        novel_id = self.entry_novel_id.get().strip()
+        download_folder = self.entry_download_folder.get().strip()
+        if not novel_id or not download_folder:
+            return None
+        if self.packed_var.get():
+            path = NovelpiaDownloader.storage_path(download_folder, novel_id, 'packed')
+            if not os.path.exists(path):
+                return set()
+            store = ChapterStore(path)
+            try:
+                return NovelpiaDownloader.saved_chapter_ids(store.entries())
+            finally:
+                store.close()
+        manifest = DownloadManifest(NovelpiaDownloader.storage_path(download_folder, novel_id))
+        return NovelpiaDownloader.saved_chapter_ids(manifest.entries)
+
+    def open_search_index(self):
+        # Called from the GUI thread and download threads; returns None (after logging why) if the index can't be opened
+        with self.search_index_lock:
+            if self.search_index is None:
+                path = os.path.join(APP_DIR, 'search_index.sqlite')
+                try:
+                    self.search_index = SearchIndex(path)
+                except sqlite3.OperationalError as e:
+                    self.queue_log_action(f"[ERROR] Could not open the search index {path}: {e}")
+            return self.search_index
+
+    def search_library(self):
+        query = self.entry_search.get().strip()
+        if not query:
+            return
+        search_index = self.open_search_index()
+        if search_index is None:
+            return
+        start = time.perf_counter()
+        try:
+            hits = search_index.search(query, limit=50)
+        except sqlite3.OperationalError as e:
+            self.log_action(f"[ERROR] Search failed: {e}")
+            return
+        elapsed = time.perf_counter() - start
+
+        self.search_results.config(state=tk.NORMAL)
+        self.search_results.delete("1.0", tk.END)
+        for hit in hits:
+            heading = f"[{hit['novel_id']}] {hit['novel_title'] or ''} #{hit['number']:04d} {hit['title']}"
+            self.search_results.insert(tk.END, heading + "\n", "heading")
+            line_start = self.search_results.index("end-1c")
+            self.search_results.insert(tk.END, "    " + hit['snippet'] + "\n")
+            if hit['highlight']:
+                first, last = hit['highlight']
+                self.search_results.tag_add("match", f"{line_start}+{first + 4}c", f"{line_start}+{last + 4}c")
+        self.search_results.config(state=tk.DISABLED)
+        self.log_action(f"Search for '{query}': {len(hits)} hits in {elapsed * 1000:.0f} ms")
 
     def browse_folder(self):
         folder_selected = filedialog.askdirectory()
@@ -421,11 +3067,6 @@ class NovelpiaDownloaderGUI:
                 self.text_cookies.delete('1.0', tk.END)
                 self.text_cookies.insert(tk.END, file.read())
 
-    def mouse_select(self, event):
-        self.chapter_listbox.selection_anchor(tk.ACTIVE)
-        self.chapter_listbox.selection_set(tk.ACTIVE)
-        return "break"
-
     def download_selected_chapters(self):
         novel_id = self.entry_novel_id.get()
         cookies_json = self.text_cookies.get("1.0", tk.END)
@@ -435,14 +3076,23 @@ class NovelpiaDownloaderGUI:
         except ValueError:
             messagebox.showerror("Invalid Input", "Download interval must be a number.")
             return
+        try:
+            max_workers = int(self.entry_workers.get() or 1)
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Concurrent workers must be a whole number.")
+            return
+        try:
+            max_rate = float(self.entry_max_rate.get()) if self.entry_max_rate.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Max requests/second must be a number.")
+            return
 
         if not novel_id or not cookies_json or not download_folder:
             messagebox.showerror("Missing Information", "Please fill out all fields.")
             return
 
         try:
-            cookies = json.loads(cookies_json)
-            cookies_dict = {cookie['name']: cookie['value'] for cookie in cookies}
+            cookies_dict = parse_cookies(cookies_json)
         except json.JSONDecodeError:
             messagebox.showerror("Invalid JSON", "The cookies JSON is not valid.")
             return
@@ -455,23 +3105,27 @@ class NovelpiaDownloaderGUI:
             return
 
         self.thread = threading.Thread(target=self._download_selected_chapters_thread, 
-                                       args=(novel_id, cookies_dict, download_folder, download_interval, selected_chapters))
+                                       args=(novel_id, cookies_dict, download_folder, download_interval, max_workers,
+                                             self.adaptive_var.get(), max_rate, self.resume_var.get(), self.epub_var.get(), self.profile_var.get(),
+                                             self.packed_var.get(), self.index_var.get(), selected_chapters,
+                                             self.novel_info if self.novel_info_id == novel_id else None))
         self.thread.start()
-        self.root.after(100, self.process_queue)
 
-    def _download_selected_chapters_thread(self, novel_id, cookies, download_folder, download_interval, selected_chapters):
-        downloader = NovelpiaDownloader(novel_id, cookies, download_folder, download_interval, self.queue_log_action)
-        
-        downloaded_chapters = []
-        total_chapters = len(selected_chapters)
+    def _download_selected_chapters_thread(self, novel_id, cookies, download_folder, download_interval, max_workers,
+                                           adaptive, max_rate, resume, build_epub, profile, packed, index, selected_chapters,
+                                           novel_info):
+        downloader = NovelpiaDownloader(novel_id, cookies, download_folder, download_interval, self.queue_log_action,
+                                        max_workers=max_workers, adaptive=adaptive, max_rate=max_rate, resume=resume, build_epub=build_epub, profile=profile,
+                                        storage='packed' if packed else 'files', compress=packed, client=self.client,
+                                        search_index=self.open_search_index() if index else None, novel_info=novel_info)
+        if downloader.search_index and not downloader.novel_info:
+            # Chapters indexed without a title show up nameless in search results
+            downloader.get_novel_info()
+
+        def report_progress(completed, total_chapters):
+            self.queue.put(("update_progress", (completed / total_chapters) * 100))
 
-        for i, chapter in enumerate(selected_chapters, 1):
-            self.queue_log_action(f"Downloading chapter {chapter['number']}: {chapter['title']}")
-            downloader.download_chapter(chapter)
-            downloaded_chapters.append(chapter)
-            progress = (i / total_chapters) * 100
-            self.queue.put(("update_progress", progress))
-            time.sleep(download_interval)
+        downloaded_chapters = downloader.download_chapters(selected_chapters, report_progress)
 
         self.queue_log_action("Compiling novel...")
         downloader.compile_novel(downloaded_chapters)
@@ -479,16 +3133,22 @@ class NovelpiaDownloaderGUI:
         self.queue.put(("show_completion_message",))
 
     def process_queue(self):
+        # Runs every frame for the life of the window: drain everything the worker threads
+        # queued, then apply the log lines in a single insert
         try:
             while True:
                 message = self.queue.get_nowait()
                 if message[0] == "log":
-                    self.log_action(message[1])
+                    self.pending_log.append(message[1])
                 elif message[0] == "update_novel_info":
-                    self.update_novel_info(message[1])
+                    self.update_novel_info(*message[1:])
+                elif message[0] == "show_cover":
+                    self.show_cover(*message[1])
                 elif message[0] == "update_chapter_list":
-                    self.chapters = message[1]
+                    self.chapters = ChapterIndex(message[1])
                     self.update_chapter_list()
+                elif message[0] == "append_chapters":
+                    self.append_chapters(message[1])
                 elif message[0] == "update_progress":
                     self.progress_var.set(message[1])
                 elif message[0] == "show_completion_message":
@@ -496,21 +3156,247 @@ class NovelpiaDownloaderGUI:
         except queue.Empty:
             pass
         finally:
-            if self.thread is not None and self.thread.is_alive():
-                self.root.after(100, self.process_queue)
+            self.flush_log()
+            self.root.after(self.FRAME_INTERVAL, self.process_queue)
 
     def queue_log_action(self, message):
         self.queue.put(("log", message))
 
     def log_action(self, message):
-        if message.startswith("[ERROR]"):
-            self.log_text.insert(tk.END, message + "\n", "error")
-        else:
-            self.log_text.insert(tk.END, message + "\n")
+        # Shown on the next frame together with whatever the workers logged
+        self.pending_log.append(message)
+
+    def flush_log(self):
+        if not self.pending_log:
+            return
+        messages, self.pending_log = self.pending_log, []
+
+        if self.log_file is not None:
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.log_file.write(''.join(f"{timestamp} {message}\n" for message in messages))
+            self.log_file.flush()
+
+        # Lines that would be trimmed straight away are never inserted
+        chunks = []
+        for message in messages[-self.LOG_LINES:]:
+            chunks.extend((message + "\n", "error" if message.startswith("[ERROR]") else ()))
+        self.log_text.insert(tk.END, *chunks)
+
+        # Ring buffer: drop the oldest lines once the widget holds more than LOG_LINES
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - self.LOG_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
 
-if __name__ == "__main__":
+def run_gui():
+    load_gui_modules()
     root = tk.Tk()
     gui = NovelpiaDownloaderGUI(root)
     root.mainloop()
+
+def novel_logger(novel_id):
+    def logger(message):
+        print(f"[{novel_id}] {message}", flush=True)
+    return logger
+
+def make_downloader(novel_id, cookies, args, client=None, search_index=None, resume=None, controller=None):
+    download_folder = os.path.join(args.output, novel_id)
+    return NovelpiaDownloader(novel_id, cookies, download_folder, args.interval, novel_logger(novel_id),
+                              max_workers=args.workers, resume=args.resume if resume is None else resume,
+                              build_epub=args.epub, use_cache=args.cache, adaptive=args.adaptive, max_rate=args.max_rate,
+                              profile=args.profile, storage=args.storage, compress=args.compress, client=client,
+                              search_index=search_index, parse_processes=args.parse_processes, controller=controller)
+
+def download_novel(novel_id, cookies, args, client=None, search_index=None, controller=None):
+    logger = novel_logger(novel_id)
+    downloader = make_downloader(novel_id, cookies, args, client, search_index, controller=controller)
+    novel_info = downloader.get_novel_info()
+    if not novel_info:
+        return False
+
+    chapters = downloader.get_chapter_list()
+    if not chapters:
+        logger("[ERROR] No chapters found.")
+        return False
+    logger(f"Found {len(chapters)} chapters.")
+    if args.chapters:
+        chapters = ChapterIndex(chapters.select(args.chapters, known=downloader.downloaded_chapter_ids()))
+        logger(f"Selected {len(chapters)} chapters: {args.chapters}")
+
+    def report_progress(completed, total_chapters):
+        if completed == total_chapters or completed % 50 == 0:
+            logger(f"Progress: {completed}/{total_chapters} chapters")
+
+    downloaded_chapters = downloader.download_chapters(chapters, report_progress)
+    downloader.compile_novel(downloaded_chapters)
+    if args.export_files:
+        downloader.export_chapters()
+    return True
+
+def read_novel_list(args):
+    # novel_id -> poll interval in seconds (None for the default). Lines of the IDs file may
+    # give a per-novel interval after the ID: "12345 600"
+    novels = {novel_id: None for novel_id in args.novel_ids}
+    if args.ids_file:
+        with open(args.ids_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.split('#')[0].split()
+                if fields:
+                    novels[fields[0]] = float(fields[1]) if len(fields) > 1 else None
+    return novels
+
+def load_cookie_file(args):
+    if not args.cookies:
+        return {}
+    with open(args.cookies, 'r', encoding='utf-8') as f:
+        return parse_cookies(f.read())
+
+def run_batch(args):
+    novel_ids = list(read_novel_list(args))
+    cookies = load_cookie_file(args)
+
+    jobs = queue.Queue()
+    for novel_id in novel_ids:
+        jobs.put(novel_id)
+    failed = []
+
+    # One connection pool for all novel workers, sized for all of their chapter workers at once,
+    # and one rate limit: --interval applies to the whole batch, however many novels run at a time
+    novel_workers = max(1, min(args.novel_workers, len(novel_ids)))
+    max_in_flight = max(1, args.workers) * novel_workers
+    client = HttpClient(args.pool_size or max_in_flight, args.connect_timeout, args.read_timeout, args.compression)
+    controller = AdaptiveController.for_interval(args.interval, max_in_flight, novel_logger('batch'),
+                                                 max_rate=args.max_rate, adaptive=args.adaptive)
+    search_index = SearchIndex(search_index_path(args)) if args.index else None
+
+    def worker():
+        while True:
+            try:
+                novel_id = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if not download_novel(novel_id, cookies, args, client, search_index, controller):
+                    failed.append(novel_id)
+            except Exception as e:
+                logging.exception(f"Unexpected error while downloading novel {novel_id}")
+                print(f"[{novel_id}] [ERROR] {e}", flush=True)
+                failed.append(novel_id)
+
+    threads = [threading.Thread(target=worker) for _ in range(novel_workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"Finished {len(novel_ids) - len(failed)}/{len(novel_ids)} novels.", flush=True)
+    if failed:
+        print(f"Failed: {', '.join(failed)}", flush=True)
+    return 1 if failed else 0
+
+def run_watch(args):
+    novels = read_novel_list(args)
+    cookies = load_cookie_file(args)
+    # Watched novels are checked one at a time, so the pool only needs one novel's workers
+    client = HttpClient(args.pool_size or max(1, args.workers), args.connect_timeout, args.read_timeout, args.compression)
+    search_index = SearchIndex(search_index_path(args)) if args.index else None
+
+    def make_watch_downloader(novel_id):
+        # Resume is what limits each update to the new chapters
+        return make_downloader(novel_id, cookies, args, client, search_index, resume=True)
+
+    watcher = LibraryWatcher({novel_id: interval or args.watch_interval for novel_id, interval in novels.items()},
+                             make_watch_downloader, args.output, lambda message: print(message, flush=True),
+                             request_budget=args.watch_budget)
+    print(f"Watching {len(novels)} novels (Ctrl+C to stop)", flush=True)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+def search_index_path(args):
+    return args.search_index or os.path.join(args.output, 'search_index.sqlite')
+
+def run_search(args):
+    path = search_index_path(args)
+    if not os.path.exists(path):
+        print(f"No search index at {path}", flush=True)
+        return 1
+    search_index = SearchIndex(path)
+    hits = []
+    for novel_id in args.novel_ids or [None]:
+        hits.extend(search_index.search(args.search, novel_id, args.search_limit))
+    hits.sort(key=lambda hit: hit['score'], reverse=True)
+    for hit in hits[:args.search_limit]:
+        print(f"[{hit['novel_id']}] {hit['novel_title'] or ''} #{hit['number']} {hit['title']}\n    {hit['snippet']}")
+    print(f"{len(hits[:args.search_limit])} hits.", flush=True)
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Download novels from Novelpia. Starts the GUI when no novel IDs are given.")
+    parser.add_argument('novel_ids', nargs='*', help="novel IDs to download")
+    parser.add_argument('--ids-file', help="file with one novel ID per line, optionally followed by its --watch interval in seconds ('#' starts a comment)")
+    parser.add_argument('--cookies', help="cookie JSON export, the same format the GUI accepts")
+    parser.add_argument('--chapters', metavar='SPEC',
+                        help="only these chapters, e.g. '1-100,250,900-', '/외전/' to match titles or 'new' for "
+                             "chapters not downloaded yet")
+    parser.add_argument('--output', default='.', help="output directory; each novel gets its own subfolder")
+    parser.add_argument('--interval', type=float, default=0.5, help="average seconds between requests, shared by all --novel-workers (0 for no limit)")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent chapter downloads per novel")
+    parser.add_argument('--adaptive', action=argparse.BooleanOptionalAction, default=True,
+                        help="tune request rate and concurrency from observed errors and latency")
+    parser.add_argument('--max-rate', type=float, help="upper bound in requests/second for the adaptive controller "
+                             "(default: 4x the --interval rate, none with --interval 0)")
+    parser.add_argument('--novel-workers', type=int, default=1, help="novels downloaded at the same time")
+    parser.add_argument('--parse-processes', type=int, default=0,
+                        help="parse chapters in this many worker processes, pipelined with the downloads "
+                             "(0 parses on the download threads)")
+    parser.add_argument('--pool-size', type=int,
+                        help="keep-alive connections in the shared pool (default: workers x novel workers)")
+    parser.add_argument('--connect-timeout', type=float, default=10.0, help="seconds to wait for a connection")
+    parser.add_argument('--read-timeout', type=float, default=30.0, help="seconds to wait for the server between bytes")
+    parser.add_argument('--compression', action=argparse.BooleanOptionalAction, default=True,
+                        help="ask for gzip/deflate (and brotli, if installed) compressed responses")
+    parser.add_argument('--resume', action=argparse.BooleanOptionalAction, default=True,
+                        help="skip chapters the manifest already records as downloaded")
+    parser.add_argument('--epub', action='store_true', help="also build an EPUB for each novel")
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=True,
+                        help="keep a response cache under each novel's folder")
+    parser.add_argument('--profile', action='store_true', help="profile the download with cProfile and save the stats")
+    parser.add_argument('--storage', choices=['files', 'packed'], default='files',
+                        help="keep chapters as loose .txt files or packed into one SQLite file per novel")
+    parser.add_argument('--compress', action='store_true', help="zlib-compress chapters in the packed store")
+    parser.add_argument('--export-files', action='store_true',
+                        help="with --storage packed, also write the chapters out as loose .txt files")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep polling the novels for new chapters and download them as they appear")
+    parser.add_argument('--watch-interval', type=float, default=3600,
+                        help="default seconds between checks of a novel (the IDs file can set one per novel)")
+    parser.add_argument('--watch-budget', type=float,
+                        help="maximum episode_list requests per hour across all watched novels")
+    parser.add_argument('--index', action=argparse.BooleanOptionalAction, default=True,
+                        help="add downloaded chapters to the library's full-text search index")
+    parser.add_argument('--search-index', help="search index file (default: search_index.sqlite in --output)")
+    parser.add_argument('--search', metavar='QUERY',
+                        help="search the downloaded library instead of downloading (novel IDs limit the search)")
+    parser.add_argument('--search-limit', type=int, default=20, help="maximum number of search hits to show")
+    parser.add_argument('--log-level', default='WARNING', help="logging level for the console (default: WARNING)")
+    parser.add_argument('--gui', action='store_true', help="start the GUI even if novel IDs are given")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.search:
+        return run_search(args)
+    if args.gui or not (args.novel_ids or args.ids_file):
+        run_gui()
+        return 0
+    logging.getLogger().setLevel(args.log_level.upper())
+    if args.watch:
+        return run_watch(args)
+    return run_batch(args)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+import requests
+from Novelpia_Download_Helper import NovelpiaDownloader
+from novelpia_stub_server import add_server_arguments, serve_in_process
+
+# End-to-end benchmark of NovelpiaDownloader against the local stub server:
+# list, download and compile one synthetic novel and report where the time went.
+
+def run_benchmark(args, base_url, download_folder):
+    messages = []
+    downloader = NovelpiaDownloader('1', {}, download_folder, args.interval, messages.append,
+                                    max_workers=args.workers, use_cache=args.cache, image_workers=args.image_workers,
+                                    adaptive=args.adaptive, max_rate=args.max_rate, base_url=base_url,
+                                    parse_processes=args.parse_processes)
+    report = {}
+
+    start = time.perf_counter()
+    downloader.get_novel_info()
+    report['info_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chapters = downloader.get_chapter_list()
+    report['list_seconds'] = time.perf_counter() - start
+    report['chapters_listed'] = len(chapters)
+
+    start = time.perf_counter()
+    downloader.download_chapters(chapters)
+    report['download_seconds'] = time.perf_counter() - start
+    report['chapters_per_second'] = len(chapters) / report['download_seconds'] if report['download_seconds'] else 0
+
+    start = time.perf_counter()
+    downloader.compile_novel(chapters)
+    report['compile_seconds'] = time.perf_counter() - start
+
+    summary = downloader.metrics.summary()
+    report['bytes_per_second'] = summary['bytes_per_second']
+    report['requests'] = summary['requests']
+    report['errors'] = sum(stats['errors'] for stats in summary['endpoints'].values())
+    report['endpoint_latency'] = {endpoint: stats['total'] for endpoint, stats in summary['endpoints'].items()}
+    report['chapter_stages'] = summary['chapter_stages']
+    report['parse_seconds_total'] = sum(timings.get('parse', 0) for timings in downloader.metrics.chapters.values())
+    report['controller'] = downloader.controller.state()
+    report['failed_chapters'] = sum(1 for name in os.listdir(os.path.join(download_folder, 'chapters')) if name.startswith('ERROR_'))
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the downloader end to end against a local Novelpia stand-in")
+    add_server_arguments(parser)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--image-workers', type=int, default=4)
+    parser.add_argument('--parse-processes', type=int, default=0, help="run the staged pipeline with this many parse processes")
+    parser.add_argument('--interval', type=float, default=0)
+    parser.add_argument('--max-rate', type=float, default=1000)
+    parser.add_argument('--adaptive', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="track peak Python allocations with tracemalloc (slows the run down noticeably)")
+    parser.add_argument('--output', help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    ready = multiprocessing.Queue()
+    server_process = multiprocessing.Process(target=serve_in_process, args=(args, ready), daemon=True)
+    server_process.start()
+    try:
+        base_url = ready.get(timeout=30)
+        with tempfile.TemporaryDirectory() as download_folder:
+            if args.trace_memory:
+                tracemalloc.start()
+            report = run_benchmark(args, base_url, download_folder)
+            if args.trace_memory:
+                report['peak_traced_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        report['server_requests'] = requests.get(f"{base_url}/__stats").json()['requests']
+    finally:
+        server_process.terminate()
+        server_process.join()
+
+    try:
+        import resource
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        report['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    report['settings'] = {key: value for key, value in vars(args).items() if key != 'output'}
+
+    print(f"Listed {report['chapters_listed']} chapters in {report['list_seconds']:.2f}s")
+    print(f"Downloaded in {report['download_seconds']:.2f}s ({report['chapters_per_second']:.1f} chapters/s, "
+          f"{report['bytes_per_second'] / 1024:.0f} KiB/s, {report['failed_chapters']} failed)")
+    print(f"Parse cost: {report['parse_seconds_total']:.2f}s total")
+    print(f"Compiled in {report['compile_seconds']:.2f}s")
+    if 'peak_traced_memory_bytes' in report:
+        print(f"Peak traced memory: {report['peak_traced_memory_bytes'] / (1024 * 1024):.1f} MiB")
+    if 'max_rss' in report:
+        print(f"Max RSS: {report['max_rss']}")
+    print(f"Controller: {report['controller']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+import struct
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the parts of novelpia.com the downloader talks to, so it can
+# be exercised and benchmarked offline. Every novel ID serves the same synthetic
+# novel; latency, failures and size are configurable.
+
+def make_png(seed, size=64):
+    # A small, valid PNG whose pixels depend on the seed, so different seeds give different content hashes
+    rng = random.Random(seed)
+    rows = b''.join(b'\x00' + bytes(rng.randrange(256) for _ in range(size * 3)) for _ in range(size))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+class StubNovel:
+    def __init__(self, chapters=500, page_size=20, paragraphs=120, image_every=10, distinct_images=5, seed=1):
+        self.chapter_count = chapters
+        self.page_size = page_size
+        self.paragraphs = paragraphs
+        self.image_every = image_every
+        self.distinct_images = distinct_images
+        self.seed = seed
+        self.chapter_ids = [str(100000 + i) for i in range(1, chapters + 1)]
+        self.images = {}
+
+    def chapter_number(self, chapter_id):
+        try:
+            number = int(chapter_id) - 100000
+        except ValueError:
+            return None
+        return number if 1 <= number <= self.chapter_count else None
+
+    def novel_page(self, novel_id):
+        return (
+            '<html><body>'
+            f'<div class="epnew-novel-title">스텁 소설 {novel_id}</div>'
+            '<div class="epnew-cover-box"><img class="cover_img" src="/imagebox/cover/0.png"></div>'
+            '<div class="synopsis">로컬 벤치마크용 합성 소설입니다.\n실제 서버에 요청하지 않습니다.</div>'
+            '<div class="like-box"><span class="like-cnt">1,234</span></div>'
+            '<div class="view-box"><span class="view-cnt">56,789</span></div>'
+            '</body></html>'
+        )
+
+    def episode_list(self, page, newest_first=False):
+        chapter_ids = self.chapter_ids[::-1] if newest_first else self.chapter_ids
+        start = page * self.page_size
+        rows = []
+        for chapter_id in chapter_ids[start:start + self.page_size]:
+            number = self.chapter_number(chapter_id)
+            rows.append(
+                '<tr><td class="font12">'
+                f'<b><i class="icon ion-bookmark" id="bookmark_{chapter_id}"></i>{number}화 &lt;시험&gt; 에피소드</b>'
+                '</td></tr>'
+            )
+        return '<table>' + ''.join(rows) + '</table>'
+
+    def viewer_data(self, chapter_id):
+        number = self.chapter_number(chapter_id)
+        rng = random.Random(self.seed * 1000003 + number)
+        items = []
+        if self.image_every and number % self.image_every == 0:
+            image = rng.randrange(self.distinct_images)
+            items.append({'text': f'<p><img class="cover-img" src="/imagebox/illust/{image}.png"></p>'})
+        for i in range(self.paragraphs):
+            sentence = ' '.join(rng.choice(['그는', '그녀는', '마법사가', '검을', '조용히', '하늘을', '바라보았다.', '웃었다.'])
+                                for _ in range(rng.randrange(4, 14)))
+            if i % 7 == 0:
+                items.append({'text': f'<p style="text-align:left">“{sentence}”</p>'})
+            else:
+                # viewer_data double-escapes the paragraph markers, hence &amp;nbsp;
+                items.append({'text': f'{sentence}&amp;nbsp;'})
+        return {'s': items}
+
+    def image(self, path):
+        if path not in self.images:
+            self.images[path] = make_png(hashlib.sha256(path.encode('utf-8')).hexdigest())
+        return self.images[path]
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if self.path == '/__stats':
+            return self.send_body(200, json.dumps({'requests': server.request_count}).encode('utf-8'), 'application/json')
+        with server.stats_lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(max(0.0, random.gauss(server.latency, server.latency / 4)))
+
+        roll = random.random()
+        if roll < server.throttle_rate:
+            return self.send_body(429, b'Too Many Requests', 'text/plain', {'Retry-After': str(server.retry_after)})
+        if roll < server.throttle_rate + server.error_rate:
+            return self.send_body(503, b'Service Unavailable', 'text/plain')
+
+        path = urlparse(self.path).path
+        novel = server.novel
+        if method == 'GET' and path.startswith('/novel/'):
+            return self.send_body(200, novel.novel_page(path.split('/')[2]).encode('utf-8'), 'text/html; charset=utf-8')
+        if method == 'POST' and path == '/proc/episode_list':
+            form = parse_qs(body.decode('utf-8'))
+            page = int(form.get('page', ['0'])[0])
+            newest_first = form.get('sort', ['DOWN'])[0] == 'UP'
+            return self.send_body(200, novel.episode_list(page, newest_first).encode('utf-8'), 'text/html; charset=utf-8')
+        if method == 'GET' and path.startswith('/proc/viewer_data/'):
+            chapter_id = path.rsplit('/', 1)[1]
+            if novel.chapter_number(chapter_id) is None:
+                return self.send_body(404, b'Not Found', 'text/plain')
+            payload = json.dumps(novel.viewer_data(chapter_id), ensure_ascii=False).encode('utf-8')
+            return self.send_body(200, payload, 'application/json; charset=utf-8')
+        if method == 'GET' and path.startswith('/imagebox/'):
+            return self.send_body(200, novel.image(path), 'image/png')
+        self.send_body(404, b'Not Found', 'text/plain')
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class NovelpiaStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, novel, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1):
+        super().__init__((host, port), StubRequestHandler)
+        self.novel = novel
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.stats_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def add_server_arguments(parser):
+    parser.add_argument('--chapters', type=int, default=500, help="chapters in the synthetic novel")
+    parser.add_argument('--page-size', type=int, default=20, help="chapters per episode_list page")
+    parser.add_argument('--paragraphs', type=int, default=120, help="paragraphs per chapter")
+    parser.add_argument('--image-every', type=int, default=10, help="put an illustration in every Nth chapter (0 for none)")
+    parser.add_argument('--latency', type=float, default=0.0, help="mean response latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429 responses")
+
+def server_from_args(args, port=0):
+    novel = StubNovel(chapters=args.chapters, page_size=args.page_size, paragraphs=args.paragraphs,
+                      image_every=args.image_every)
+    return NovelpiaStubServer(novel, port=port, latency=args.latency, error_rate=args.error_rate,
+                              throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+
+def serve_in_process(args, ready):
+    # Target for multiprocessing: run the server in its own process so it doesn't compete with the client for the GIL
+    server = server_from_args(args)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic Novelpia novel on localhost")
+    add_server_arguments(parser)
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = server_from_args(args, args.port)
+    print(f"Serving {args.chapters} chapters at {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import html
+import time
+from bs4 import BeautifulSoup
+from Novelpia_Download_Helper import parse_chapter_body
+
+# viewer_data `s` payloads covering the markup seen in Novelpia chapters plus the
+# edge cases the fast parser has to treat exactly like BeautifulSoup
+CORPUS = [
+    [{'text': '그녀는 조용히 고개를 끄덕였다.'}],
+    [{'text': '첫 문단입니다.&amp;nbsp;둘째 문단입니다.&amp;nbsp;&amp;nbsp;셋째 문단입니다.'}],
+    [{'text': '<p style="text-align:left">“안녕하세요.”</p><p>  공백이 있는 문단  </p>'}],
+    [{'text': '<p><img class="cover-img" src="/imagebox/cover/abc.jpg"></p><p>표지 다음 문장</p>'}],
+    [{'text': '앞 문장 <img src="//images.novelpia.com/a.png" class="deco cover-img" alt="삽화"> 뒤 문장'}],
+    [{'text': '<img class="other" src="/x.jpg"><img class="cover-img" src="/y.jpg"><img class="cover-img" src="/z.jpg">'}],
+    [{'text': '<img class="cover-img">소스 없는 이미지'}],
+    [{'text': '<b>굵게</b>와 <i>기울임</i>, <span class="a">스팬</span>'}],
+    [{'text': '&amp;lt;태그처럼 보이는 텍스트&amp;gt; &amp;quot;따옴표&amp;quot;'}],
+    [{'text': '1 &lt; 2 그리고 3 &gt; 2'}],
+    [{'text': 'a < b 그리고 c > d'}],
+    [{'text': '&amp;foo; 알 수 없는 엔티티 &amp;amp &amp;copy 세미콜론 없음'}],
+    [{'text': '&amp;#44032;&amp;#xAC01; 숫자 참조 &amp;#0; &amp;#150;'}],
+    [{'text': '<!-- 주석 -->본문<!DOCTYPE html><?xml version="1.0"?>'}],
+    [{'text': '<![CDATA[시데이터]]> 뒤'}],
+    [{'text': '<script>var x = "<b>숨김</b>";</script>보임<style>p { color: red; }</style>'}],
+    [{'text': '<ruby>漢字<rp>(</rp><rt>한자</rt><rp>)</rp></ruby> 읽기'}],
+    [{'text': '<template><p>템플릿</p></template>템플릿 밖'}],
+    [{'text': '<b>그는</b>  <b>말했다</b>'}],
+    [{'text': '<p>첫 문단</p>   <p>둘째 문단</p>'}],
+    [{'text': '<span>탭으로</span>\t\t<span>나뉜 스팬</span>'}],
+    [{'text': '<pre>서식</pre><pre>   </pre>유지<textarea>가<b>  </b>나</textarea>'}],
+    [{'text': '<rt>루비<b>숨김</b>  </style>계속 숨김</rt>보임'}],
+    [{'text': '<b><rt>숨김</b>닫힌 뒤 보임<!-- 주석 -->  <!-- 주석 --><b>끝</b>'}],
+    [{'text': '<p>닫히지 않은 태그\n다음 줄</p>\n\n\n마지막 줄'}],
+    [{'text': '<div\nclass="x">줄바꿈이 있는 태그</div>'}],
+    [{'text': '<p title="a &amp;amp; b">속성</p> <img class="cover-img" src="/q.jpg?a=1&amp;amp;b=2">'}],
+    [{'text': '끝에 미완성 태그 <p'}],
+    [{'text': '   '}, {'text': ''}, {}],
+    [{'text': '&amp;nbsp;&amp;nbsp;&amp;nbsp;'}],
+    [{'text': '가' * 50}, {'text': '<p>나</p>' * 20}],
+]
+
+def legacy_parse(items):
+    # The BeautifulSoup-per-paragraph path used by download_chapter before the fast parser
+    # (images without a src are skipped instead of raising KeyError)
+    segments = []
+    for item in items:
+        text = item.get('text', '')
+        text = html.unescape(text)
+
+        text = text.replace('&nbsp;&nbsp;', '\n\n')
+        text = text.replace('&nbsp;', '\n')
+
+        for para in text.split('\n'):
+            soup = BeautifulSoup(para, 'html.parser')
+            for img in soup.find_all('img', class_='cover-img'):
+                if img.get('src') is not None:
+                    segments.append(('image', img['src']))
+            processed_text = soup.get_text().strip()
+            if processed_text:
+                segments.append(('text', processed_text))
+    return segments
+
+def build_chapter(paragraphs):
+    # Roughly the shape of a real chapter: mostly plain paragraphs, some markup and the odd illustration
+    items = []
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            items.append({'text': f'<p><img class="cover-img" src="/imagebox/{i}.jpg"></p>'})
+        elif i % 5 == 0:
+            items.append({'text': f'<p style="text-align:left">“대사 {i}번입니다.” 그가 말했다.</p>'})
+        else:
+            items.append({'text': f'평범한 서술 문단 {i}번입니다.&amp;nbsp;이어지는 문장입니다.'})
+    return items
+
+def check_equivalence():
+    mismatches = 0
+    for index, items in enumerate(CORPUS):
+        expected = legacy_parse(items)
+        actual = parse_chapter_body(items)
+        if actual != expected:
+            mismatches += 1
+            print(f"Mismatch in corpus entry {index}:\n  expected {expected!r}\n  actual   {actual!r}")
+    print(f"Equivalence: {len(CORPUS) - mismatches}/{len(CORPUS)} corpus entries match")
+    return mismatches == 0
+
+def benchmark(parse, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(items)
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the fast chapter parser against BeautifulSoup and time both")
+    parser.add_argument('--paragraphs', type=int, default=400, help="paragraphs in the synthetic benchmark chapter")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if not check_equivalence():
+        raise SystemExit(1)
+
+    items = build_chapter(args.paragraphs)
+    if parse_chapter_body(items) != legacy_parse(items):
+        print("Mismatch on the synthetic benchmark chapter")
+        raise SystemExit(1)
+
+    legacy_time = benchmark(legacy_parse, items, args.repeat)
+    fast_time = benchmark(parse_chapter_body, items, args.repeat)
+    print(f"BeautifulSoup per paragraph: {legacy_time * 1000:.2f} ms/chapter")
+    print(f"ChapterBodyParser:           {fast_time * 1000:.2f} ms/chapter")
+    print(f"Speedup: {legacy_time / fast_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
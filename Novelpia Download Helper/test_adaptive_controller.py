@@ -0,0 +1,122 @@
+import logging
+import random
+import threading
+import time
+import unittest
+
+import requests
+
+from Novelpia_Download_Helper import AdaptiveController, RateLimiter
+from novelpia_stub_server import NovelpiaStubServer, StubNovel
+
+# Runs the adaptive throttle against the local Novelpia stand-in:
+#   python -m unittest test_adaptive_controller
+
+class AdaptiveControllerTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(1)
+        self.server = NovelpiaStubServer(StubNovel(chapters=50))
+        self.base_url = self.server.start()
+        self.session = requests.Session()
+        self.log = []
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def send(self, method, url, **kwargs):
+        return self.session.request(method, url, timeout=5, **kwargs)
+
+    def url(self, index):
+        return f"{self.base_url}/proc/viewer_data/{100001 + index % 50}"
+
+    def run_requests(self, controller, count, workers=4):
+        statuses = []
+        lock = threading.Lock()
+        indexes = iter(range(count))
+
+        def worker():
+            while True:
+                with lock:
+                    index = next(indexes, None)
+                if index is None:
+                    return
+                response = controller.request(self.send, 'GET', self.url(index))
+                with lock:
+                    statuses.append(response.status_code)
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_retry_after_is_honoured(self):
+        self.server.throttle_rate = 1.0
+        self.server.retry_after = 1
+        attempts = []
+
+        def send(method, url, **kwargs):
+            attempts.append(time.monotonic())
+            response = self.send(method, url, **kwargs)
+            # Only the first attempt is throttled
+            self.server.throttle_rate = 0.0
+            return response
+
+        controller = AdaptiveController(RateLimiter(None, 1), self.log.append, max_retries=2)
+        response = controller.request(send, 'GET', self.url(0))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.95)
+        self.assertEqual(controller.retries, 1)
+
+    def test_rate_drops_under_throttling_and_recovers(self):
+        limiter = RateLimiter(50.0, 4)
+        controller = AdaptiveController(limiter, self.log.append, max_rate=60.0, window=10, latency_factor=1000.0,
+                                        base_delay=0.01, max_delay=0.05)
+        start_rate = controller.rate
+
+        # Throttle until the controller has backed off once
+        self.server.throttle_rate = 0.5
+        self.server.retry_after = 0
+        for _ in range(10):
+            self.run_requests(controller, 10)
+            if controller.rate < start_rate:
+                break
+        dropped_rate = controller.rate
+        self.assertLess(dropped_rate, start_rate)
+        self.assertEqual(limiter.requests_per_second, dropped_rate)
+
+        self.server.throttle_rate = 0.0
+        statuses = self.run_requests(controller, 150)
+        self.assertEqual(set(statuses), {200})
+        self.assertGreaterEqual(controller.rate, dropped_rate * 2)
+        self.assertEqual(controller.concurrency, 4)
+
+    def test_scattered_errors_do_not_pin_the_rate(self):
+        limiter = RateLimiter(50.0, 4)
+        controller = AdaptiveController(limiter, self.log.append, max_rate=60.0, window=10, latency_factor=1000.0,
+                                        base_delay=0.01, max_delay=0.05)
+        self.server.error_rate = 0.05
+        self.run_requests(controller, 150)
+        self.assertGreaterEqual(controller.rate, 50.0)
+
+    def test_floor_and_ceiling_follow_the_configured_interval(self):
+        slow = AdaptiveController(RateLimiter(0.1, 1), self.log.append)
+        self.assertEqual(slow.min_rate, 0.1)
+        self.assertEqual(slow.max_rate, 0.4)
+
+        unlimited_limiter = RateLimiter(None, 4)
+        unlimited = AdaptiveController(unlimited_limiter, self.log.append)
+        self.assertIsNone(unlimited.rate)
+        self.assertIsNone(unlimited_limiter.requests_per_second)
+
+        capped_limiter = RateLimiter(None, 4)
+        AdaptiveController(capped_limiter, self.log.append, max_rate=5.0)
+        self.assertEqual(capped_limiter.requests_per_second, 5.0)
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    unittest.main()